@@ -0,0 +1,102 @@
+import json
+import mimetypes
+import os
+import threading
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Имена с хешем содержимого не меняются — их можно кешировать навсегда.
+IMMUTABLE_MAX_AGE: int = 365 * 24 * 60 * 60
+# Прочие файлы (без хеша в имени) — ненадолго.
+DEFAULT_MAX_AGE: int = 60
+# Предпочтение сжатых копий при Accept-Encoding.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticFilesMiddleware:
+    """Отдает собранную статику из STATIC_ROOT, когда DEBUG выключен.
+
+    Список файлов строится один раз — обход каталога на запрос не
+    нужен. Файлы из манифеста ManifestStaticFilesStorage (с хешем в
+    имени) получают Cache-Control на год, при поддержке клиентом
+    отдается готовая копия `.br` или `.gz` (core.staticfiles).
+    Остальные запросы идут дальше по цепочке.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._files = None
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(
+                settings.STATIC_URL):
+            entry = self.files().get(
+                request.path_info[len(settings.STATIC_URL):]
+            )
+            if entry is not None:
+                return self.serve(request, *entry)
+        return self.get_response(request)
+
+    def files(self):
+        if self._files is None:
+            with self._lock:
+                if self._files is None:
+                    self._files = self.scan(settings.STATIC_ROOT)
+        return self._files
+
+    def scan(self, root):
+        """{имя: (путь, {кодировка: путь}, неизменяемый ли)} из root."""
+        if not root or not os.path.isdir(root):
+            return {}
+        immutable = set()
+        manifest = os.path.join(root, 'staticfiles.json')
+        if os.path.exists(manifest):
+            with open(manifest, encoding='utf-8') as stored:
+                immutable.update(json.load(stored).get('paths', {}).values())
+        files = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if name.endswith(('.gz', '.br')):
+                    continue
+                encoded = {
+                    encoding: path + extension
+                    for encoding, extension in ENCODINGS
+                    if os.path.exists(path + extension)
+                }
+                files[name] = (path, encoded, name in immutable)
+        return files
+
+    def serve(self, request, path, encoded, immutable):
+        stat = os.stat(path)
+        if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size,
+        ):
+            return HttpResponseNotModified()
+        content_type = mimetypes.guess_type(path)[0]
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        encoding = next(
+            (name for name, _ in ENCODINGS
+             if name in encoded and name in accepted), None
+        )
+        response = FileResponse(open(encoded.get(encoding, path), 'rb'))
+        # FileResponse угадал бы тип по имени сжатой копии.
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if encoded:
+            response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if immutable:
+            response['Cache-Control'] = (
+                f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+            )
+        else:
+            response['Cache-Control'] = f'public, max-age={DEFAULT_MAX_AGE}'
+        return response
@@ -0,0 +1,68 @@
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not getattr(_state, 'paused', False):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def outside_budget():
+    """Запросы внутри блока не считаются в бюджет вьюхи.
+
+    Для фоновых задач, которые без пула потоков (BACKGROUND_WORKERS = 0)
+    выполняются прямо в запросе: в продакшене их запросы идут в своих
+    потоках и соединениях.
+    """
+    paused = getattr(_state, 'paused', False)
+    _state.paused = True
+    try:
+        yield
+    finally:
+        _state.paused = paused
+
+
+def query_budget(limit):
+    """Ограничивает число SQL-запросов вьюхи вместе с рендером шаблона.
+
+    Превышение пишется в лог, а при QUERY_BUDGET_STRICT = True падает
+    с QueryBudgetExceeded. Лимит доступен как `view.query_budget`.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = view_func(request, *args, **kwargs)
+            if counter.count > limit:
+                message = (
+                    f'{view_func.__module__}.{view_func.__name__}: '
+                    f'{counter.count} запросов при бюджете {limit} '
+                    f'({request.method} {request.path})'
+                )
+                if settings.QUERY_BUDGET_STRICT:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
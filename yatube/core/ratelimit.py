@@ -0,0 +1,120 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): запросов за период в секундах."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def client_ip(request):
+    """IP клиента из RATELIMIT_IP_META (за прокси — его заголовок).
+
+    Начало X-Forwarded-For присылает сам клиент, доверять можно только
+    записям, которые дописали справа наши прокси: берется
+    RATELIMIT_PROXY_HOPS-я запись с конца.
+    """
+    value = request.META.get(settings.RATELIMIT_IP_META, '')
+    entries = [entry.strip() for entry in value.split(',') if entry.strip()]
+    if not entries:
+        return 'unknown'
+    return entries[-min(settings.RATELIMIT_PROXY_HOPS, len(entries))]
+
+
+def identities(request, limits):
+    """(scope, идентификатор, лимит) для лимитов вьюхи.
+
+    `user` считается только у авторизованных, `ip` — у всех.
+    """
+    for scope, rate in limits.items():
+        if scope == 'user':
+            if request.user.is_authenticated:
+                yield scope, request.user.pk, rate
+        elif scope == 'ip':
+            yield scope, client_ip(request), rate
+
+
+def _buckets(key, period, now):
+    bucket = int(now // period)
+    return f'{key}:{bucket}', f'{key}:{bucket - 1}', now / period - bucket
+
+
+def hit(key, limit, period, now):
+    """Учитывает запрос; 0, если в скользящем окне `period` с ним не
+    больше `limit` запросов, иначе сколько секунд подождать.
+
+    Окно приближается двумя счетчиками в общем кеше — текущего и
+    прошлого периода; прошлый берется с весом еще не прошедшей доли.
+    Счетчик сначала увеличивается (add и incr в кеше атомарны), и с
+    лимитом сравнивается уже полученное значение: параллельные запросы
+    не проходят все по одному и тому же старому счетчику.
+    """
+    current_key, previous_key, elapsed = _buckets(key, period, now)
+    cache.add(current_key, 0, period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # Ключ истек между add и incr.
+        cache.add(current_key, 1, period * 2)
+        current = 1
+    used = cache.get(previous_key, 0) * (1 - elapsed) + current
+    if used <= limit:
+        return 0
+    return max(1, math.ceil((1 - elapsed) * period))
+
+
+def release(key, period, now):
+    """Возвращает отклоненный запрос из счетчика текущего периода."""
+    current_key, _, _ = _buckets(key, period, now)
+    try:
+        cache.decr(current_key)
+    except ValueError:
+        # Период успел смениться — возвращать нечего.
+        pass
+
+
+def ratelimit(name, methods=('POST',)):
+    """Ограничивает частоту запросов к вьюхе по RATE_LIMITS[name].
+
+    RATE_LIMITS[name] — словарь {'user': '10/m', 'ip': '30/m'}: лимит на
+    пользователя и на IP. Превышение любого — ответ 429 с Retry-After
+    до вызова вьюхи: ни форм, ни хеширования паролей, ни записей в базу.
+    Запросы других методов (`methods`) не считаются.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            limits = settings.RATE_LIMITS.get(name)
+            if limits and request.method in methods:
+                now = time.time()
+                windows = [
+                    (f'ratelimit:{name}:{scope}:{identity}',
+                     *parse_rate(rate))
+                    for scope, identity, rate in identities(request, limits)
+                ]
+                waits = [
+                    hit(key, limit, period, now)
+                    for key, limit, period in windows
+                ]
+                if any(waits):
+                    # Отклоненные запросы счетчики не увеличивают.
+                    for key, _, period in windows:
+                        release(key, period, now)
+                    response = HttpResponse(
+                        'Слишком много запросов, попробуйте позже.',
+                        content_type='text/plain; charset=utf-8',
+                        status=429,
+                    )
+                    response['Retry-After'] = str(max(waits))
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,71 @@
+import gzip
+import logging
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Уже сжатые форматы: gzip их только увеличит.
+SKIP_EXTENSIONS = frozenset((
+    '.gz', '.br', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif',
+    '.woff', '.woff2', '.zip',
+))
+# Сжатая копия нужна, только если она заметно меньше оригинала.
+MIN_RATIO: float = 0.95
+
+
+def compressed_copies(data):
+    """{расширение: сжатые данные} для .gz и, если есть brotli, .br."""
+    copies = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        copies['.br'] = brotli.compress(data)
+    return {
+        extension: compressed for extension, compressed in copies.items()
+        if len(compressed) < len(data) * MIN_RATIO
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, который после collectstatic кладет
+    рядом с каждым файлом сжатые копии: `.gz` и `.br` (если установлен
+    brotli). Отдает их core.middleware.StaticFilesMiddleware.
+
+    Файл, которого нет в манифесте, получает ссылку без хеша: один
+    несобранный файл даст 404 на себя, а не 500 на каждой странице.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            logger.warning('Нет в манифесте статики: %s', name)
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if not isinstance(processed, Exception):
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in names:
+            if name and os.path.splitext(name)[1].lower() not in (
+                    SKIP_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            data = source.read()
+        for extension, compressed in compressed_copies(data).items():
+            with open(path + extension, 'wb') as target:
+                target.write(compressed)
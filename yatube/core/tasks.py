@@ -0,0 +1,46 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .query_budget import outside_budget
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='yatube-task',
+        )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Фоновая задача %s упала', func.__name__)
+    finally:
+        connection.close()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Выполняет func вне запроса, в пуле из BACKGROUND_WORKERS потоков.
+
+    Задача уходит в пул после коммита текущей транзакции. При
+    BACKGROUND_WORKERS = 0 (разработка, тесты) она выполняется сразу,
+    но в бюджет запросов вьюхи не входит.
+    """
+    if not settings.BACKGROUND_WORKERS:
+        with outside_budget():
+            func(*args, **kwargs)
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run, func, args, kwargs)
+    )
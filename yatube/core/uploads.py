@@ -0,0 +1,222 @@
+import shutil
+import struct
+import tempfile
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+
+CHUNK_SIZE: int = 64 * 1024
+EXIF_HEADER: bytes = b'Exif\x00\x00'
+ORIENTATION_TAG: int = 0x0112
+
+
+class OversizedUpload(UploadedFile):
+    """Файл, загрузку которого оборвали на UPLOAD_MAX_SIZE байтах."""
+    oversized = True
+
+    def __init__(self, name, content_type, size):
+        super().__init__(BytesIO(), name, content_type, size)
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Первый в FILE_UPLOAD_HANDLERS: считает байты каждого файла.
+
+    Пока файл не больше UPLOAD_MAX_SIZE, куски идут дальше по цепочке
+    (в память или во временный файл). После превышения остаток файла
+    отбрасывается, а форма получает OversizedUpload и сообщает ошибку.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_SIZE:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received <= settings.UPLOAD_MAX_SIZE:
+            return None
+        return OversizedUpload(self.file_name, self.content_type,
+                               self.received)
+
+
+def _exif_orientation(tiff):
+    """Значение тега Orientation из TIFF-блока EXIF или None."""
+    try:
+        order = {b'II': '<', b'MM': '>'}[tiff[:2]]
+        (offset,) = struct.unpack_from(order + 'I', tiff, 4)
+        (count,) = struct.unpack_from(order + 'H', tiff, offset)
+        for index in range(count):
+            entry = offset + 2 + index * 12
+            tag, kind = struct.unpack_from(order + 'HH', tiff, entry)
+            if tag == ORIENTATION_TAG and kind == 3:
+                return struct.unpack_from(order + 'H', tiff, entry + 8)[0]
+    except (KeyError, struct.error):
+        pass
+    return None
+
+
+def _orientation_segment(orientation):
+    """APP1 с EXIF из одного тега Orientation."""
+    tiff = (
+        b'MM\x00\x2a' + struct.pack('>I', 8)
+        + struct.pack('>H', 1)
+        + struct.pack('>HHIHH', ORIENTATION_TAG, 3, 1, orientation, 0)
+        + struct.pack('>I', 0)
+    )
+    payload = EXIF_HEADER + tiff
+    return b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+
+
+def _read_marker(source):
+    """Код следующего маркера или None, если маркера нет.
+
+    Перед маркером может стоять любое число байтов-заполнителей 0xFF.
+    """
+    if source.read(1) != b'\xff':
+        return None
+    code = source.read(1)
+    while code == b'\xff':
+        code = source.read(1)
+    return code[0] if code else None
+
+
+def _read_segment(source):
+    """(длина, данные) сегмента после маркера или None, если длина
+    меньше 2 или файл обрывается раньше."""
+    length = source.read(2)
+    if len(length) != 2:
+        return None
+    (size,) = struct.unpack('>H', length)
+    if size < 2:
+        return None
+    payload = source.read(size - 2)
+    if len(payload) != size - 2:
+        return None
+    return length, payload
+
+
+def strip_jpeg_exif(source, target):
+    """Копирует JPEG из source в target без EXIF, кроме ориентации.
+
+    Файл читается по сегментам заголовка (до 64 КБ каждый), данные
+    изображения копируются кусками — весь файл в память не попадает.
+    Возвращает False, если source не JPEG или его заголовок битый
+    (обрезан, неверная длина сегмента, мусор вместо маркера); записанное
+    в target тогда нужно выбросить.
+    """
+    if source.read(2) != b'\xff\xd8':
+        return False
+    target.write(b'\xff\xd8')
+    while True:
+        code = _read_marker(source)
+        if code is None:
+            return False
+        marker = bytes((0xFF, code))
+        if code in (0xDA, 0xD9):
+            # Начало данных (SOS) или конец файла — дальше как есть.
+            target.write(marker)
+            shutil.copyfileobj(source, target, CHUNK_SIZE)
+            return True
+        if 0xD0 <= code <= 0xD7 or code == 0x01:
+            target.write(marker)
+            continue
+        segment = _read_segment(source)
+        if segment is None:
+            return False
+        length, payload = segment
+        if code == 0xE1 and payload.startswith(EXIF_HEADER):
+            orientation = _exif_orientation(payload[len(EXIF_HEADER):])
+            if orientation not in (None, 1):
+                target.write(_orientation_segment(orientation))
+            continue
+        target.write(marker + length + payload)
+
+
+class BoundedImagesMixin:
+    """Ограничения загрузок для форм с ImageField.
+
+    Файлы, оборванные LimitedUploadHandler, убираются из формы еще до
+    проверки полей и дают ошибку «слишком большой». У прочих картинок
+    число пикселей (IMAGE_MAX_PIXELS) берется из заголовка, который уже
+    прочитал ImageField, а EXIF у JPEG вырезается потоково — ориентация
+    сохраняется. Картинка целиком не декодируется.
+    """
+    upload_error_messages = {
+        'too_large': 'Файл больше %(limit)s.',
+        'too_many_pixels': 'Картинка больше %(limit)s пикселей.',
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.oversized = [
+            name for name, upload in self.files.items()
+            if getattr(upload, 'oversized', False)
+        ]
+        if self.oversized:
+            self.files = self.files.copy()
+            for name in self.oversized:
+                del self.files[name]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for name in self.oversized:
+            self.add_error(name, forms.ValidationError(
+                self.upload_error_messages['too_large'], code='too_large',
+                params={'limit': filesizeformat(settings.UPLOAD_MAX_SIZE)},
+            ))
+        for name, field in self.fields.items():
+            upload = cleaned_data.get(name)
+            if isinstance(field, forms.ImageField) and isinstance(
+                upload, UploadedFile
+            ):
+                try:
+                    self.check_pixels(upload)
+                except forms.ValidationError as error:
+                    self.add_error(name, error)
+                else:
+                    cleaned_data[name] = strip_exif(upload)
+        return cleaned_data
+
+    def check_pixels(self, upload):
+        width, height = upload.image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                self.upload_error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'limit': settings.IMAGE_MAX_PIXELS},
+            )
+
+
+def strip_exif(upload):
+    """Копия JPEG-загрузки без EXIF; прочие и битые файлы возвращаются
+    как есть.
+
+    JPEG узнается по сигнатуре, а не по Content-Type от клиента. Копия
+    держится в памяти до FILE_UPLOAD_MAX_MEMORY_SIZE, дальше — во
+    временном файле, который удаляется вместе с объектом.
+    """
+    spool = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    upload.seek(0)
+    if not strip_jpeg_exif(upload, spool):
+        spool.close()
+        upload.seek(0)
+        return upload
+    cleaned = UploadedFile(
+        spool, upload.name, upload.content_type, spool.tell(),
+        upload.charset, upload.content_type_extra,
+    )
+    cleaned.seek(0)
+    if hasattr(upload, 'image'):
+        # Заголовок, прочитанный ImageField, — для check_pixels и модели.
+        cleaned.image = upload.image
+    return cleaned
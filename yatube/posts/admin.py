@@ -1,6 +1,8 @@
 from django.contrib import admin
 
 from .models import Post, Group, Follow, Comment
+from .paginators import CachedCountPaginator
+from .search import SEARCH_TABLE, match_query, search_supported
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -12,9 +14,45 @@ class PostAdmin(admin.ModelAdmin):
         'group'
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
     empty_value_display = '-пусто-'
+    # Без второго COUNT по всей таблице и с кешированным счетчиком страниц.
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if db_field.name == 'group' and request is not None:
+            # Список групп читается один раз на страницу, а не на строку.
+            choices = getattr(request, '_post_group_choices', None)
+            if choices is None:
+                choices = list(formfield.choices)
+                request._post_group_choices = choices
+            formfield.choices = choices
+        return formfield
+
+    def get_search_results(self, request, queryset, search_term):
+        match = match_query(search_term)
+        if not (match and search_supported()):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        # Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице.
+        table = Post._meta.db_table
+        found = queryset.extra(
+            where=[
+                f'{table}.id IN (SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s)'
+            ],
+            params=[match],
+        )
+        return found, False
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,173 @@
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db.models import F
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from core.query_budget import query_budget
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator, InvalidCursor
+from .views import COMMENTS_Q, POSTS_Q
+
+VERSION: str = 'v1'
+# Поля API и пути к ним для values(): строки ответа собираются из
+# словарей values(), модели не создаются.
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'post': 'post_id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+FEED_KEY = ('-pub_date', '-pk')
+FOLLOW_KEY = ('-feed_date', '-pk')
+COMMENTS_KEY = ('created', 'pk')
+
+
+def api_error(status, message, field=NON_FIELD_ERRORS):
+    """Ошибка в том же виде, что form.errors у follow_bulk."""
+    return JsonResponse({'errors': {field: [message]}}, status=status)
+
+
+def requested_fields(request, available):
+    """Поля из `?fields=id,text` в порядке запроса; по умолчанию все.
+
+    Неизвестные поля — ValueError со списком.
+    """
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    fields = list(dict.fromkeys(
+        name.strip() for name in raw.split(',') if name.strip()
+    ))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError(', '.join(unknown))
+    return fields
+
+
+def image_url(name):
+    if not name:
+        return None
+    return Post._meta.get_field('image').storage.url(name)
+
+
+def serialize(rows, fields, available):
+    converters = {'image': image_url}
+    return [
+        {
+            name: converters.get(name, lambda value: value)(
+                row[available[name]]
+            )
+            for name in fields
+        }
+        for row in rows
+    ]
+
+
+def select(queryset, fields, available, key=()):
+    """values() только с нужными полями и полями ключа курсора."""
+    paths = {available[name] for name in fields}
+    paths.update(name.lstrip('-') for name in key)
+    return queryset.values(*paths)
+
+
+def page_response(request, queryset, available, key, per_page):
+    """Страница по курсору `?cursor=`: results, next и previous."""
+    try:
+        fields = requested_fields(request, available)
+    except ValueError as error:
+        return api_error(400, f'Неизвестные поля: {error}', 'fields')
+    rows = select(queryset, fields, available, key)
+    paginator = CursorPaginator(rows, per_page, key=key)
+    try:
+        page = paginator.cursor_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return api_error(400, 'Неверный курсор', 'cursor')
+    return JsonResponse({
+        'results': serialize(page, fields, available),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@query_budget(1)
+@require_GET
+def posts(request):
+    return page_response(
+        request, Post.objects.all(), POST_FIELDS, FEED_KEY, POSTS_Q
+    )
+
+
+@query_budget(2)
+@require_GET
+def group_posts(request, slug):
+    group_id = (
+        Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    )
+    if group_id is None:
+        return api_error(404, 'Группа не найдена')
+    return page_response(
+        request, Post.objects.filter(group=group_id), POST_FIELDS,
+        FEED_KEY, POSTS_Q,
+    )
+
+
+@query_budget(2)
+@require_GET
+def profile_posts(request, username):
+    author_id = (
+        User.objects.filter(username=username)
+        .values_list('pk', flat=True).first()
+    )
+    if author_id is None:
+        return api_error(404, 'Автор не найден')
+    return page_response(
+        request, Post.objects.filter(author=author_id), POST_FIELDS,
+        FEED_KEY, POSTS_Q,
+    )
+
+
+@query_budget(3)
+@require_GET
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return api_error(401, 'Нужна авторизация')
+    timeline = Post.objects.filter(
+        timeline_entries__user=request.user
+    ).annotate(feed_date=F('timeline_entries__pub_date'))
+    return page_response(
+        request, timeline, POST_FIELDS, FOLLOW_KEY, POSTS_Q
+    )
+
+
+@query_budget(1)
+@require_GET
+def post_detail(request, post_id):
+    try:
+        fields = requested_fields(request, POST_FIELDS)
+    except ValueError as error:
+        return api_error(400, f'Неизвестные поля: {error}', 'fields')
+    row = select(
+        Post.objects.filter(pk=post_id), fields, POST_FIELDS
+    ).first()
+    if row is None:
+        return api_error(404, 'Пост не найден')
+    return JsonResponse(serialize([row], fields, POST_FIELDS)[0])
+
+
+@query_budget(1)
+@require_GET
+def post_comments(request, post_id):
+    return page_response(
+        request, Comment.objects.filter(post=post_id), COMMENT_FIELDS,
+        COMMENTS_KEY, COMMENTS_Q,
+    )
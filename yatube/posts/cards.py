@@ -0,0 +1,31 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .thumbnail_store import prefetch_card_thumbnails
+
+CARD_TEMPLATE: str = 'includes/post_card.html'
+CARD_TIMEOUT: int = 60 * 60 * 24
+
+
+def card_key(post):
+    """Ключ карточки: id поста и версия — время последнего изменения."""
+    return f'post-card:{post.pk}:{post.updated.timestamp():.6f}'
+
+
+def render_cards(posts):
+    """HTML карточек постов; готовые берутся из кеша одним get_many."""
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    stale = [post for key, post in zip(keys, posts) if key not in cards]
+    # Миниатюры всех перерисовываемых карточек — одним заходом в кеш.
+    prefetch_card_thumbnails(stale)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            missing[key] = render_to_string(CARD_TEMPLATE, {'post': post})
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,85 @@
+import hashlib
+
+from django.db.models import Count, OuterRef, Subquery
+
+from .feed_cache import feed_version
+from .follow_graph import follow_graph
+from .models import Comment, Group, Post, User
+
+
+def _latest(queryset, field):
+    """Самое свежее значение `field` — по индексу, без агрегата."""
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def make_etag(request, *parts):
+    """ETag страницы для condition(): метаданные страницы, зритель (id и
+    CSRF-cookie — от них зависят кнопки и формы) и полный путь.
+
+    Метаданные берутся одним запросом по индексам: самая свежая
+    `updated` (правки, переименования группы и автора — touch_posts),
+    денормализованные счетчики, версия ленты из feed_cache (новые и
+    удаленные посты, правки группы, подписки), у поста — время
+    последнего комментария и их число. Страница и шаблоны при 304 не
+    нужны.
+    """
+    viewer = (request.user.pk or 0, request.META.get('CSRF_COOKIE', ''))
+    raw = '|'.join(str(part) for part in (
+        *parts, *viewer, request.get_full_path()
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def group_etag(request, slug):
+    row = (
+        Group.objects.filter(slug=slug)
+        .annotate(last_updated=_latest(
+            Post.objects.filter(group=OuterRef('pk')), 'updated'
+        ))
+        .values_list('pk', 'posts_count', 'last_updated').first()
+    )
+    if row is None:
+        return None
+    return make_etag(request, feed_version(f'group:{slug}'), *row)
+
+
+def profile_etag(request, username):
+    row = (
+        User.objects.filter(username=username)
+        .annotate(last_updated=_latest(
+            Post.objects.filter(author=OuterRef('pk')), 'updated'
+        ))
+        .values_list('pk', 'profile__posts_count', 'last_updated').first()
+    )
+    if row is None:
+        return None
+    author_id = row[0]
+    return make_etag(
+        request, feed_version(f'profile:{username}'), *row,
+        follow_graph.followers_count(author_id),
+        follow_graph.following_count(author_id),
+        request.user.is_authenticated and follow_graph.is_following(
+            request.user.pk, author_id
+        ),
+    )
+
+
+def post_etag(request, post_id):
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by()
+    row = (
+        Post.objects.filter(pk=post_id)
+        .annotate(
+            last_comment=_latest(comments, 'created'),
+            comments_count=Subquery(
+                comments.values('post').annotate(count=Count('pk'))
+                .values('count')
+            ),
+        )
+        .values_list(
+            'updated', 'author__profile__posts_count',
+            'last_comment', 'comments_count',
+        ).first()
+    )
+    if row is None:
+        return None
+    return make_etag(request, *row)
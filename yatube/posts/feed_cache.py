@@ -0,0 +1,93 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+
+FEED_CACHE_TIMEOUT: int = 60 * 60
+
+
+def _version_key(feed):
+    return f'feed-version:{feed}'
+
+
+def _post_version_key(post_id):
+    return f'post-version:{post_id}'
+
+
+def feed_version(feed):
+    """Текущая версия ленты; входит в ключи всех ее страниц."""
+    key = _version_key(feed)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def post_versions(post_ids):
+    """Текущие версии постов {ключ: версия}; недостающие создаются.
+
+    Вытесненная из кеша версия создается заново и не совпадает ни с
+    одной прежней, так что страница со старой версией не пройдет
+    проверку.
+    """
+    keys = [_post_version_key(pk) for pk in post_ids]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        version = time.time_ns()
+        for key in missing:
+            cache.add(key, version, None)
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def invalidate_feeds(*feeds):
+    """Новая версия лент: все их закешированные страницы устаревают."""
+    version = time.time_ns()
+    cache.set_many({_version_key(feed): version for feed in feeds}, None)
+
+
+def invalidate_post_pages(*post_ids):
+    """Устаревают только закешированные страницы, где выводится пост:
+    новая версия поста не совпадет с сохраненной при странице."""
+    version = time.time_ns()
+    cache.set_many(
+        {_post_version_key(pk): version for pk in post_ids}, None
+    )
+
+
+def cache_feed(feed, timeout=FEED_CACHE_TIMEOUT):
+    """Кеширует ответы ленты под версией `feed`.
+
+    `feed` — имя ленты, форматируется аргументами вьюхи, например
+    'group:{slug}'. Ответ кешируется отдельно для каждого пользователя
+    и каждого набора GET-параметров. Вьюха сообщает выведенные посты
+    через `request.feed_post_ids`: страница хранится с версиями этих
+    постов и при их смене (invalidate_post_pages) считается промахом.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            name = feed.format(**kwargs)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            page_key = 'feed-page:{}:{}:{}:{}'.format(
+                name, feed_version(name), request.user.pk or 0, path
+            )
+            cached = cache.get(page_key)
+            if cached is not None:
+                versions, response = cached
+                if cache.get_many(list(versions)) == versions:
+                    return response
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                versions = post_versions(
+                    getattr(request, 'feed_post_ids', ())
+                )
+                cache.set(page_key, (versions, response), timeout)
+            return response
+        return wrapper
+    return decorator
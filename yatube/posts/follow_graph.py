@@ -0,0 +1,195 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from functools import partial
+
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import transaction
+
+from .models import Follow
+
+GRAPH_VERSION_KEY: str = 'follow-graph-version'
+EMPTY = array('l')
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def _insert(graph, key, value):
+    """Ключу достается новый массив: уже выданные читателям не меняются."""
+    ids = graph.get(key, EMPTY)
+    index = bisect_left(ids, value)
+    if index == len(ids) or ids[index] != value:
+        graph[key] = ids[:index] + array('l', (value,)) + ids[index:]
+
+
+def _remove(graph, key, value):
+    ids = graph.get(key, EMPTY)
+    index = bisect_left(ids, value)
+    if index < len(ids) and ids[index] == value:
+        ids = ids[:index] + ids[index + 1:]
+        if ids:
+            graph[key] = ids
+        else:
+            del graph[key]
+
+
+class FollowGraph:
+    """Граф подписок в памяти процесса.
+
+    Смежность хранится отсортированными массивами id: кого читает
+    пользователь и кто читает автора. Граф загружается одним запросом
+    при первом обращении. Изменения подписок применяются только после
+    коммита: `changed` правит копию процесса по одному ребру, `invalidate`
+    сбрасывает ее целиком; оба атомарно увеличивают версию в общем кеше.
+    Версию сверяют один раз за запрос в каждом потоке, и при расхождении
+    (подписки менял другой процесс) граф перечитывается.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._following = None
+            self._followers = None
+            self._version = None
+        self._local.checked = False
+        self._local.pending = False
+
+    @staticmethod
+    def _load():
+        following, followers = {}, {}
+        rows = Follow.objects.order_by('user_id', 'author_id').values_list(
+            'user_id', 'author_id'
+        )
+        # Строки идут по возрастанию user_id, поэтому массивы подписчиков
+        # тоже заполняются уже отсортированными.
+        for user_id, author_id in rows.iterator():
+            following.setdefault(user_id, array('l')).append(author_id)
+            followers.setdefault(author_id, array('l')).append(user_id)
+        return following, followers
+
+    def _pending(self):
+        """В этом потоке открыта транзакция с еще не закоммиченными
+        изменениями подписок."""
+        return (
+            getattr(self._local, 'pending', False)
+            and transaction.get_connection().in_atomic_block
+        )
+
+    @staticmethod
+    def _shared_version():
+        version = cache.get(GRAPH_VERSION_KEY)
+        if version is None:
+            cache.add(GRAPH_VERSION_KEY, time.time_ns(), None)
+            version = cache.get(GRAPH_VERSION_KEY)
+        return version
+
+    def _graph(self):
+        """(following, followers) — снимок графа, актуальный на запрос.
+
+        Читатели работают со снимком: сброс копии другим потоком его не
+        трогает.
+        """
+        following, followers = self._following, self._followers
+        if following is not None and getattr(self._local, 'checked', False):
+            return following, followers
+        with self._lock:
+            # Версия читается до загрузки: изменение, закоммиченное во
+            # время загрузки, даст расхождение на следующем запросе.
+            version = self._shared_version()
+            if self._following is None or version != self._version:
+                if self._pending():
+                    # Граф из незакоммиченных строк в копию процесса не
+                    # попадает: при откате он остался бы навсегда.
+                    return self._load()
+                self._version = version
+                self._following, self._followers = self._load()
+            self._local.checked = True
+            return self._following, self._followers
+
+    def _bump_version(self):
+        """Новая версия в кеше; None, если ее пришлось завести заново."""
+        try:
+            return cache.incr(GRAPH_VERSION_KEY)
+        except ValueError:
+            # Версию вытеснили: новая не совпадет ни с одной прежней.
+            cache.add(GRAPH_VERSION_KEY, time.time_ns(), None)
+            return None
+
+    def _apply(self, added, removed):
+        self._local.pending = False
+        with self._lock:
+            version = self._bump_version()
+            if self._following is None:
+                return
+            if version is None or self._version is None or (
+                    version != self._version + 1):
+                # Между нашими версиями вклинился другой процесс — его
+                # изменений здесь нет, граф перечитается по расхождению.
+                return
+            for user_id, author_id in added:
+                _insert(self._following, user_id, author_id)
+                _insert(self._followers, author_id, user_id)
+            for user_id, author_id in removed:
+                _remove(self._following, user_id, author_id)
+                _remove(self._followers, author_id, user_id)
+            self._version = version
+
+    def _drop(self):
+        self._local.pending = False
+        with self._lock:
+            self._following = self._followers = None
+            self._bump_version()
+
+    def changed(self, added=(), removed=()):
+        """Подписки (user_id, author_id) добавлены или удалены: после
+        коммита они ложатся в копию процесса, откат ничего не меняет."""
+        self._local.pending = True
+        transaction.on_commit(partial(
+            self._apply, tuple(added), tuple(removed)
+        ))
+
+    def invalidate(self):
+        """Подписки изменились неизвестно как: после коммита копия
+        процесса сбрасывается и перечитается при следующем обращении."""
+        self._local.pending = True
+        transaction.on_commit(self._drop)
+
+    def is_following(self, user_id, author_id):
+        following, _ = self._graph()
+        return _contains(following.get(user_id, EMPTY), author_id)
+
+    def following_ids(self, user_id):
+        """Id авторов, на которых подписан пользователь, по возрастанию."""
+        following, _ = self._graph()
+        return tuple(following.get(user_id, EMPTY))
+
+    def follower_ids(self, author_id):
+        _, followers = self._graph()
+        return tuple(followers.get(author_id, EMPTY))
+
+    def following_count(self, user_id):
+        following, _ = self._graph()
+        return len(following.get(user_id, EMPTY))
+
+    def followers_count(self, author_id):
+        _, followers = self._graph()
+        return len(followers.get(author_id, EMPTY))
+
+    def start_request(self, **kwargs):
+        self._local.checked = False
+        self._local.pending = False
+
+
+follow_graph = FollowGraph()
+request_started.connect(
+    follow_graph.start_request, dispatch_uid='follow_graph_start_request'
+)
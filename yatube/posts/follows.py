@@ -0,0 +1,126 @@
+import csv
+import json
+
+from django.db import connection, transaction
+
+from .feed_cache import invalidate_feeds
+from .follow_graph import follow_graph
+from .models import Follow, User
+from .timeline import backfill_timeline, trim_timeline
+
+FOLLOW_BATCH: int = 500
+
+
+def read_usernames(lines):
+    """Имена из строк CSV (первая колонка) или JSONL ({"username": ...}).
+
+    Пустые строки и заголовок `username` пропускаются.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            username = json.loads(line).get('username', '')
+        else:
+            username = next(csv.reader([line]))[0]
+        username = username.strip()
+        if username and username != 'username':
+            yield username
+
+
+def _batches(usernames):
+    batch = []
+    for username in usernames:
+        batch.append(username)
+        if len(batch) == FOLLOW_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _resolve(user, batch):
+    """{id: username} авторов пачки одним запросом, без самого user."""
+    return dict(
+        User.objects.filter(username__in=batch)
+        .exclude(pk=user.pk)
+        .values_list('pk', 'username')
+    )
+
+
+def _delete_follows(user_id, author_ids):
+    """Удаляет подписки user_id на author_ids; возвращает число строк."""
+    user_column = Follow._meta.get_field('user').column
+    author_column = Follow._meta.get_field('author').column
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {Follow._meta.db_table} WHERE {user_column} = %s '
+            f'AND {author_column} IN ({placeholders})',
+            [user_id, *author_ids],
+        )
+        return cursor.rowcount
+
+
+def _invalidate_profiles(user, usernames):
+    """Кнопка подписки на страницах авторов и счетчик подписок на
+    странице самого user меняют вид."""
+    invalidate_feeds(
+        f'profile:{user.username}',
+        *(f'profile:{name}' for name in usernames),
+    )
+
+
+def follow_many(user, usernames):
+    """Подписывает user на авторов пачками по FOLLOW_BATCH имен.
+
+    На пачку: один запрос за авторами, одна вставка подписок и одна
+    вставка ленты, один сброс кеша страниц. Уже существующие подписки
+    пропускаются. Возвращает число действительно вставленных подписок:
+    ignore_conflicts молча пропускает те, что успел вставить
+    параллельный запрос, поэтому подписки пересчитываются после вставки.
+    """
+    created = 0
+    for batch in _batches(usernames):
+        authors = _resolve(user, batch)
+        if not authors:
+            continue
+        with transaction.atomic():
+            rows = Follow.objects.filter(user=user, author__in=list(authors))
+            followed = set(rows.values_list('author_id', flat=True))
+            new = [pk for pk in authors if pk not in followed]
+            if not new:
+                continue
+            # bulk_create не шлет сигналы: ленту, граф и кеш
+            # обновляем здесь, один раз на пачку.
+            Follow.objects.bulk_create(
+                (Follow(user=user, author_id=pk) for pk in new),
+                ignore_conflicts=True,
+            )
+            inserted = rows.count() - len(followed)
+            backfill_timeline(user.pk, new)
+            follow_graph.changed(added=[(user.pk, pk) for pk in new])
+        _invalidate_profiles(user, [authors[pk] for pk in new])
+        created += inserted
+    return created
+
+
+def unfollow_many(user, usernames):
+    """Отписывает user от авторов пачками. Возвращает число отписок."""
+    deleted = 0
+    for batch in _batches(usernames):
+        authors = _resolve(user, batch)
+        if not authors:
+            continue
+        with transaction.atomic():
+            # Один DELETE на пачку, без post_delete на каждую строку (а
+            # список имен не ограничен). Здесь же делается все, что
+            # делают получатели post_delete у Follow в signals: лента,
+            # граф и страницы профилей.
+            count = _delete_follows(user.pk, list(authors))
+            trim_timeline(user.pk, list(authors))
+            follow_graph.changed(removed=[(user.pk, pk) for pk in authors])
+        _invalidate_profiles(user, list(authors.values()))
+        deleted += count
+    return deleted
@@ -1,8 +1,15 @@
+import io
+import re
+
+from django import forms
 from django.forms import ModelForm
+
+from core.uploads import BoundedImagesMixin
+from .follows import read_usernames
 from .models import Post, Comment
 
 
-class PostForm(ModelForm):
+class PostForm(BoundedImagesMixin, ModelForm):
     class Meta:
         model = Post
         labels = {'group': 'Группа', 'text': 'Сообщение'}
@@ -14,3 +21,46 @@ class CommentForm(ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200)
+    group = forms.SlugField(label='Группа', required=False)
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+
+class BulkFollowForm(forms.Form):
+    FOLLOW = 'follow'
+    UNFOLLOW = 'unfollow'
+
+    action = forms.ChoiceField(
+        choices=((FOLLOW, 'Подписаться'), (UNFOLLOW, 'Отписаться')),
+        required=False,
+    )
+    usernames = forms.CharField(
+        label='Имена авторов',
+        help_text='Через запятую, пробел или с новой строки',
+        widget=forms.Textarea,
+        required=False,
+    )
+    file = forms.FileField(
+        label='Файл CSV или JSONL',
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('usernames') and not cleaned_data.get('file'):
+            raise forms.ValidationError('Укажите имена авторов или файл')
+        cleaned_data['action'] = cleaned_data.get('action') or self.FOLLOW
+        return cleaned_data
+
+    def get_usernames(self):
+        """Имена из поля и из файла; файл читается построчно."""
+        text = self.cleaned_data['usernames']
+        yield from (name for name in re.split(r'[\s,]+', text) if name)
+        upload = self.cleaned_data['file']
+        if upload:
+            yield from read_usernames(
+                io.TextIOWrapper(upload, encoding='utf-8-sig')
+            )
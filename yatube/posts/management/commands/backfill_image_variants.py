@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_card_variants
+
+
+class Command(BaseCommand):
+    help = (
+        'Рисует недостающие варианты карточек (ширины и форматы) для '
+        'уже загруженных картинок постов. Оригиналы не меняются.'
+    )
+
+    def handle(self, *args, **options):
+        names = (
+            Post.objects.exclude(image='').order_by('image')
+            .values_list('image', flat=True).distinct()
+        )
+        done = 0
+        for name in names.iterator():
+            generate_card_variants(name)
+            done += 1
+        self.stdout.write(f'Обработано картинок: {done}')
@@ -0,0 +1,134 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from posts.cards import card_key
+from posts.forms import CommentForm, PostForm, SearchForm
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CursorPaginator, page_links
+from posts.views import COMMENTS_Q, POSTS_Q
+
+BENCH_USERNAME: str = 'bench-templates'
+
+
+class Command(BaseCommand):
+    help = (
+        'Время рендера шаблонов posts с N постами на странице. Данные '
+        'создаются в транзакции, которая откатывается. Чтобы сравнить '
+        'загрузчики шаблонов, запустите с --settings '
+        'yatube.settings_production и без.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=POSTS_Q,
+            help='Постов (и комментариев) на странице.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Сколько раз рендерить каждый шаблон.',
+        )
+        parser.add_argument(
+            '--warm-cards', action='store_true',
+            help='Брать карточки постов из кеша, а не рисовать заново.',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Загрузчики: {self.loaders()}')
+        storage = {}
+        read_manifest = getattr(staticfiles_storage, 'read_manifest', None)
+        if read_manifest is not None and read_manifest() is None:
+            # Без collectstatic у {% static %} нет манифеста.
+            self.stdout.write('Манифест статики не собран — имена без хеша')
+            storage['STATICFILES_STORAGE'] = (
+                'django.contrib.staticfiles.storage.StaticFilesStorage'
+            )
+        with override_settings(**storage), transaction.atomic():
+            for name, context, posts in self.pages(options['posts']):
+                per_render = self.measure(
+                    name, context, posts, options['repeat'],
+                    options['warm_cards'],
+                )
+                self.stdout.write(
+                    f'{name}: {per_render:.2f} мс на рендер'
+                )
+            transaction.set_rollback(True)
+
+    def loaders(self):
+        engine = engines['django'].engine
+        return ', '.join(
+            type(loader).__module__ for loader in engine.template_loaders
+        )
+
+    def measure(self, name, context, posts, repeat, warm_cards):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        keys = [card_key(post) for post in posts]
+        render_to_string(name, context, request)
+        total = 0
+        for _ in range(repeat):
+            if not warm_cards:
+                cache.delete_many(keys)
+            started = time.perf_counter()
+            render_to_string(name, context, request)
+            total += time.perf_counter() - started
+        return total * 1000 / repeat
+
+    def pages(self, count):
+        """(шаблон, контекст, посты страницы) для шаблонов posts."""
+        author = User.objects.create_user(
+            username=BENCH_USERNAME, first_name='Лев', last_name='Толстой'
+        )
+        group = Group.objects.create(
+            title='Замер', slug=BENCH_USERNAME, description='Описание'
+        )
+        # bulk_create — без сигналов: лент, счетчиков и миниатюр не надо.
+        Post.objects.bulk_create(
+            Post(author=author, group=group, text=f'Пост {i}\n' * 10)
+            for i in range(count + 1)
+        )
+        posts = Post.objects.filter(author=author).select_related(
+            'author', 'group'
+        )
+        page_obj = CursorPaginator(posts, count).cursor_page()
+        page_obj.links = page_links(page_obj, '/')
+        rows = list(page_obj)
+        post = rows[0]
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, text=f'Комментарий {i}')
+            for i in range(count + 1)
+        )
+        comments = CursorPaginator(
+            Comment.objects.filter(post=post).select_related('author'),
+            min(count, COMMENTS_Q), key=('created', 'pk'),
+        ).cursor_page()
+        list(comments)
+        search_form = SearchForm({'q': 'Пост'})
+        search_form.is_valid()
+        yield 'posts/index.html', {'page_obj': page_obj, 'index': True}, rows
+        yield 'posts/group_list.html', {
+            'group': group, 'page_obj': page_obj,
+        }, rows
+        yield 'posts/profile.html', {
+            'author': author, 'posts_count': count, 'followers_count': 0,
+            'following_count': 0, 'following': False, 'page_obj': page_obj,
+        }, rows
+        yield 'posts/follow.html', {
+            'title': 'Избранные авторы', 'page_obj': page_obj,
+            'follow': True,
+        }, rows
+        yield 'posts/search.html', {
+            'form': search_form, 'posts': rows,
+            'next_cursor': page_obj.next_cursor,
+        }, rows
+        yield 'posts/post_detail.html', {
+            'post': post, 'form': CommentForm(), 'comments': comments,
+        }, [post]
+        yield 'posts/create_post.html', {'form': PostForm()}, []
@@ -0,0 +1,125 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from posts.feed_cache import invalidate_post_pages
+from posts.models import Post, StoredFile
+from posts.storage import content_hash
+
+IMAGE_DIR: str = 'posts'
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит картинки постов на имена по хешу содержимого: '
+        'одинаковые файлы в media/posts сливаются в один, посты '
+        'переписываются на него, счетчики ссылок пересчитываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не менять.',
+        )
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help='Удалить файлы, на которые не ссылается ни один пост.',
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        dry_run = options['dry_run']
+        names = (
+            Post.objects.exclude(image='').order_by('image')
+            .values_list('image', flat=True).distinct()
+        )
+        renamed = merged = missing = 0
+        for name in names.iterator():
+            if not storage.exists(name):
+                missing += 1
+                continue
+            with storage.open(name) as content:
+                # Имя строится от IMAGE_DIR, а не от каталога name: иначе
+                # уже разложенный файл уехал бы во вложенные шарды.
+                target = storage.hashed_name(
+                    os.path.join(IMAGE_DIR, os.path.basename(name)),
+                    content_hash(content),
+                )
+                if target == name:
+                    continue
+                renamed += 1
+                if storage.exists(target):
+                    merged += 1
+                elif not dry_run:
+                    storage._save(target, content)
+            if not dry_run:
+                self.move_posts(storage, name, target)
+        if not dry_run:
+            self.count_references()
+        orphans = self.orphans(storage)
+        if orphans and options['delete_orphans'] and not dry_run:
+            for name in orphans:
+                storage.remove_unreferenced(name)
+        self.stdout.write(
+            f'Переименовано: {renamed}, слито с копиями: {merged}, '
+            f'нет файла: {missing}, без ссылок: {len(orphans)}'
+        )
+
+    def move_posts(self, storage, name, target):
+        """Переводит посты с name на target; старый файл удаляется.
+
+        Ссылки на target прибавляются в той же транзакции: прерванный
+        запуск не оставит файл, на который ссылаются посты, без счетчика.
+        """
+        with transaction.atomic():
+            posts = Post.objects.filter(image=name)
+            pks = list(posts.values_list('pk', flat=True))
+            # update() без сигналов: новая версия карточек и сброс
+            # страниц постов — здесь.
+            posts.update(image=target, updated=timezone.now())
+            if pks:
+                storage.add_reference(target, len(pks))
+            StoredFile.objects.filter(name=name).delete()
+        invalidate_post_pages(*pks)
+        storage.remove_unreferenced(name)
+
+    def count_references(self):
+        """Подтягивает StoredFile до числа постов с картинкой.
+
+        Все в одной транзакции, счетчики меняются на месте. Ниже числа
+        постов счетчик не опускается, строки без постов не удаляются: их
+        может держать загрузка, чей пост еще не закоммичен. Лишняя ссылка
+        только дольше хранит файл, недостающая удалила бы используемый.
+        """
+        with transaction.atomic():
+            counts = (
+                Post.objects.exclude(image='').order_by()
+                .values_list('image').annotate(refs=Count('pk'))
+            )
+            for name, refs in counts:
+                stored, created = (
+                    StoredFile.objects.select_for_update()
+                    .get_or_create(name=name, defaults={'refs': refs})
+                )
+                if not created and stored.refs < refs:
+                    StoredFile.objects.filter(pk=stored.pk).update(
+                        refs=refs
+                    )
+
+    def orphans(self, storage):
+        referenced = set(
+            Post.objects.exclude(image='')
+            .values_list('image', flat=True)
+        )
+        if not storage.exists(IMAGE_DIR):
+            return []
+        _, files = storage.listdir(IMAGE_DIR)
+        return [
+            name for name in (
+                os.path.join(IMAGE_DIR, filename) for filename in files
+            )
+            if name not in referenced
+        ]
@@ -0,0 +1,103 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from posts.models import Follow, Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.views import POSTS_Q
+
+FEED_INDEXES = (
+    'post_pub_date_idx',
+    'post_author_date_idx',
+    'post_group_date_idx',
+)
+# Глубина «дальней» страницы ленты в строках.
+DEEP_OFFSET: int = 1000
+
+
+def feed_querysets():
+    """(имя, queryset, ключ) для каждой ленты из posts/views.py.
+
+    Берутся самые длинные ленты: автор и группа с наибольшим числом
+    постов, читатель с наибольшим числом подписок.
+    """
+    posts = Post.objects.select_related('author', 'group')
+    yield 'index', posts, ('-pub_date', '-pk')
+    group = Group.objects.order_by('-posts_count').first()
+    if group is not None:
+        yield 'group_posts', posts.filter(group=group), ('-pub_date', '-pk')
+    author = User.objects.annotate(total=Count('posts')).order_by(
+        '-total'
+    ).first()
+    if author is not None:
+        yield 'profile', posts.filter(author=author), ('-pub_date', '-pk')
+    reader = Follow.objects.values('user').annotate(
+        total=Count('pk')
+    ).order_by('-total').first()
+    if reader is not None:
+        timeline = posts.filter(
+            timeline_entries__user=reader['user']
+        ).annotate(feed_date=F('timeline_entries__pub_date'))
+        yield 'follow_index', timeline, ('-feed_date', '-pk')
+
+
+def feed_queries():
+    """Запросы, которые выполняют вьюхи: первая страница по курсору,
+    страница глубоко в ленте и COUNT для `?page=N`."""
+    for name, queryset, key in feed_querysets():
+        paginator = CursorPaginator(queryset, POSTS_Q, key=key)
+        rows = paginator.object_list
+        yield name, rows[:POSTS_Q + 1]
+        deep = rows[DEEP_OFFSET:DEEP_OFFSET + 1].first() or rows.last()
+        if deep is not None:
+            after = paginator._after(paginator._key(deep), True)
+            yield f'{name} (+{DEEP_OFFSET})', rows.filter(after)[:POSTS_Q + 1]
+        yield f'{name} (count)', rows.order_by().values('pk')
+
+
+class Command(BaseCommand):
+    help = (
+        'Планы и время запросов лент без индексов лент и с ними. '
+        'Индексы удаляются внутри транзакции, которая откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнить каждый запрос для замера.',
+        )
+
+    def measure(self, queryset, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.all())
+        return (time.perf_counter() - started) * 1000 / repeat
+
+    def report(self, title, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in feed_queries():
+            self.stdout.write(
+                f'{name}: {self.measure(queryset, repeat):.2f} мс'
+            )
+            self.stdout.write(queryset.explain())
+
+    def existing_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table
+            )
+        return [name for name in FEED_INDEXES if name in constraints]
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for name in self.existing_indexes():
+                    cursor.execute(
+                        f'DROP INDEX {connection.ops.quote_name(name)}'
+                    )
+            self.report('До: без индексов лент', repeat)
+            transaction.set_rollback(True)
+        self.report('После: с индексами лент', repeat)
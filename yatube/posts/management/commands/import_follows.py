@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.follows import follow_many, read_usernames, unfollow_many
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Подписывает пользователя на авторов из файла CSV или JSONL '
+        '(по имени в строке). Без файла имена читаются из stdin.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Кого подписываем.')
+        parser.add_argument('path', nargs='?', help='Файл со списком.')
+        parser.add_argument(
+            '--unfollow', action='store_true',
+            help='Отписать от авторов из списка.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        action = unfollow_many if options['unfollow'] else follow_many
+        if options['path']:
+            with open(options['path'], encoding='utf-8-sig') as lines:
+                count = action(user, read_usernames(lines))
+        else:
+            count = action(user, read_usernames(sys.stdin))
+        verb = 'Отписок' if options['unfollow'] else 'Новых подписок'
+        self.stdout.write(f'{verb}: {count}')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Group, Post, User
+from users.models import Profile
+
+
+def posts_count_subquery(field, outer):
+    counts = (
+        Post.objects.filter(**{field: OuterRef(outer)})
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов у профилей авторов и групп.'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        missing = User.objects.filter(profile=None).values_list(
+            'pk', flat=True
+        )
+        Profile.objects.bulk_create(Profile(user_id=pk) for pk in missing)
+        profiles = Profile.objects.update(
+            posts_count=posts_count_subquery('author', 'user')
+        )
+        groups = Group.objects.update(
+            posts_count=posts_count_subquery('group', 'pk')
+        )
+        self.stdout.write(
+            f'Пересчитано профилей: {profiles}, групп: {groups}'
+        )
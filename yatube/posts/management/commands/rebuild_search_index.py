@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import install_search_index, search_supported
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает полнотекстовый индекс постов и его триггеры, если их нет, '
+        'и заполняет индекс заново.'
+    )
+
+    def handle(self, *args, **options):
+        if not search_supported():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite.')
+        install_search_index()
+        self.stdout.write('Поисковый индекс перестроен')
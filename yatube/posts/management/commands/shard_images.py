@@ -0,0 +1,109 @@
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.tasks import run_in_background
+from posts.feed_cache import invalidate_post_pages
+from posts.models import Post, StoredFile
+from posts.storage import SHARD_LEVELS, content_hash
+from posts.thumbnails import generate_card_variants
+
+BATCH_SIZE: int = 100
+# Имя уже в раскладке по хешу: posts/ab/cd/<sha256>.gif.
+SHARDED_NAME: str = r'/([0-9a-f]{2}/){%d}[0-9a-f]{64}\.[^/]*$' % SHARD_LEVELS
+DIGEST = re.compile(r'^[0-9a-f]{64}$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов из плоского каталога в раскладку по '
+        'префиксу хеша (posts/ab/cd/…) пачками, не останавливая сайт: '
+        'файл копируется, посты переписываются в транзакции, старый '
+        'файл и его миниатюры удаляются после коммита.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько картинок переносить за транзакцию.',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза между пачками, секунд.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, ничего не менять.',
+        )
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        names = (
+            Post.objects.exclude(image='')
+            .exclude(image__regex=SHARDED_NAME)
+            .order_by('image').values_list('image', flat=True).distinct()
+        )
+        moved = missing = 0
+        last = ''
+        while True:
+            batch = list(names.filter(image__gt=last)[:options['batch_size']])
+            if not batch:
+                break
+            last = batch[-1]
+            moves = {}
+            for name in batch:
+                if not self.storage.exists(name):
+                    missing += 1
+                    continue
+                moves[name] = self.target_name(name)
+            moved += len(moves)
+            if moves and not options['dry_run']:
+                self.move_posts(moves)
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(f'Перенесено: {moved}, нет файла: {missing}')
+
+    def target_name(self, name):
+        """Новое имя файла; у имен по хешу хеш берется из имени."""
+        stem = name.rsplit('/', 1)[-1].split('.', 1)[0]
+        if not DIGEST.match(stem):
+            with self.storage.open(name) as content:
+                stem = content_hash(content)
+        return self.storage.hashed_name(name, stem)
+
+    def move_posts(self, moves):
+        """Переписывает посты пачки на новые имена одной транзакцией.
+
+        До коммита читатели видят старые имена, и старые файлы на месте;
+        удаляются они только после коммита.
+        """
+        # Копии — до транзакции: к коммиту новые файлы уже на месте.
+        for name, target in moves.items():
+            if not self.storage.exists(target):
+                with self.storage.open(name) as content:
+                    self.storage._save(target, content)
+        with transaction.atomic():
+            posts = Post.objects.filter(image__in=list(moves))
+            pks = list(posts.values_list('pk', flat=True))
+            # update() без сигналов: новая версия карточек — здесь.
+            for name, target in moves.items():
+                count = Post.objects.filter(image=name).update(
+                    image=target, updated=timezone.now()
+                )
+                # Счетчик нового имени растет на месте: его строку могут
+                # держать загрузки того же содержимого, чьи посты еще не
+                # закоммичены. Удаляются только строки старых имен.
+                if count:
+                    self.storage.add_reference(target, count)
+            StoredFile.objects.filter(name__in=list(moves)).delete()
+            transaction.on_commit(lambda: self.cleanup(moves, pks))
+
+    def cleanup(self, moves, pks):
+        invalidate_post_pages(*pks)
+        for name in moves:
+            self.storage.remove_unreferenced(name)
+        for target in set(moves.values()):
+            run_in_background(generate_card_variants, target)
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:59
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_posts_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    Profile = apps.get_model('users', 'Profile')
+    by_group = Post.objects.values('group').annotate(total=Count('pk'))
+    for row in by_group.exclude(group=None):
+        Group.objects.filter(pk=row['group']).update(posts_count=row['total'])
+    by_author = Post.objects.values('author').annotate(total=Count('pk'))
+    for row in by_author:
+        Profile.objects.filter(user=row['author']).update(
+            posts_count=row['total']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_follow'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Всего постов'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='group',
+            field=models.ForeignKey(blank=True, help_text='Группа поста', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='text',
+            field=models.TextField(help_text='Введите текст поста', verbose_name='Текст'),
+        ),
+        migrations.RunPython(fill_posts_counters, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
-from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import post_image_storage
+
 POST_S: int = 15
 
 User = get_user_model()
@@ -16,6 +17,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -34,6 +39,7 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
 
@@ -42,12 +48,37 @@ class Post(models.Model):
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты сортируются по (-pub_date, -id) — см. CursorPaginator.
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+            # Свежая правка в ленте автора или группы — для ETag.
+            models.Index(
+                fields=['author', 'updated'], name='post_author_updated_idx'
+            ),
+            models.Index(
+                fields=['group', 'updated'], name='post_group_updated_idx'
+            ),
+        ]
 
 
 class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Заголовок')
     slug = models.SlugField(unique=True, verbose_name='Ссылка')
     description = models.TextField(verbose_name='Описание')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Всего постов'
+    )
 
     def __str__(self):
         return self.title
@@ -71,6 +102,14 @@ class Comment(models.Model):
     )
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ('created',)
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -85,3 +124,46 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор поста'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            ),
+        ]
+
+
+class StoredFile(models.Model):
+    """Число постов, ссылающихся на файл в ContentAddressedStorage."""
+    name = models.CharField(max_length=255, unique=True)
+    refs = models.PositiveIntegerField(default=0)
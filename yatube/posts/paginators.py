@@ -0,0 +1,216 @@
+import hashlib
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+NEXT: str = 'n'
+PREVIOUS: str = 'p'
+LAST: str = 'last'
+COUNT_CACHE_TIMEOUT: int = 5 * 60
+ELLIPSIS: str = '…'
+# Сколько номеров выводить вокруг текущей страницы и у краев.
+PAGE_WINDOW: int = 2
+PAGE_ENDS: int = 1
+
+# Ссылка навигации: без href — пропуск, current — текущая страница.
+PageLink = namedtuple('PageLink', 'label href current')
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values=None):
+    """Упаковывает направление и ключ строки в непрозрачный токен."""
+    parts = [direction]
+    if values is not None:
+        date, pk = values
+        parts += [date.isoformat(), str(pk)]
+    return urlsafe_base64_encode('|'.join(parts).encode())
+
+
+def decode_cursor(token):
+    """Разбирает токен в (направление, (дата, pk) или None)."""
+    try:
+        parts = force_str(urlsafe_base64_decode(token)).split('|')
+    except (TypeError, ValueError):
+        raise InvalidCursor(token)
+    direction = parts[0]
+    if direction == LAST and len(parts) == 1:
+        return direction, None
+    if direction not in (NEXT, PREVIOUS) or len(parts) != 3:
+        raise InvalidCursor(token)
+    date = parse_datetime(parts[1])
+    if date is None or not parts[2].isdigit():
+        raise InvalidCursor(token)
+    return direction, (date, int(parts[2]))
+
+
+class CursorPaginator(Paginator):
+    """Paginator, листающий ленту по ключу (дата, pk) без OFFSET и COUNT.
+
+    Номерные страницы (`page()`, `get_page()`) работают как раньше,
+    а `cursor_page()` выбирает страницу по токену из `?cursor=`.
+    Страницы любого вида получают ссылки `previous_cursor`/`next_cursor`,
+    так что дальше по ленте пользователь идет уже по ключу.
+    """
+
+    def __init__(self, object_list, per_page, key=('-pub_date', '-pk'),
+                 count=None, **kwargs):
+        self.descending = key[0].startswith('-')
+        self.fields = [name.lstrip('-') for name in key]
+        super().__init__(object_list.order_by(*key), per_page, **kwargs)
+        self.last_cursor = encode_cursor(LAST)
+        if count is not None:
+            # Известный счетчик заменяет COUNT в cached_property count.
+            self.count = count
+
+    def _key(self, obj):
+        if isinstance(obj, dict):
+            # Строки values() — для JSON API.
+            return tuple(obj[name] for name in self.fields)
+        return tuple(getattr(obj, name) for name in self.fields)
+
+    def _after(self, values, forward):
+        """Условие «строго после ключа» в направлении обхода."""
+        lookup = 'lt' if forward == self.descending else 'gt'
+        date_field, pk_field = self.fields
+        date, pk = values
+        return (
+            Q(**{f'{date_field}__{lookup}': date})
+            | Q(**{date_field: date, f'{pk_field}__{lookup}': pk})
+        )
+
+    def _set_cursors(self, page, rows, has_previous, has_next):
+        page.previous_cursor = page.next_cursor = None
+        if has_previous and rows:
+            page.previous_cursor = encode_cursor(PREVIOUS, self._key(rows[0]))
+        if has_next and rows:
+            page.next_cursor = encode_cursor(NEXT, self._key(rows[-1]))
+        return page
+
+    def page(self, number):
+        page = super().page(number)
+        # list() заполняет кеш queryset, второго запроса не будет.
+        rows = list(page.object_list)
+        return self._set_cursors(
+            page, rows, page.has_previous(), page.has_next())
+
+    def cursor_page(self, token=None):
+        """Страница по курсору; без токена — первая страница ленты."""
+        direction, values = decode_cursor(token) if token else (NEXT, None)
+        if direction == LAST:
+            return self.last_page()
+        forward = direction == NEXT
+        rows = self.object_list
+        if not forward:
+            rows = rows.reverse()
+        if values is not None:
+            rows = rows.filter(self._after(values, forward))
+        rows = list(rows[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+        page = Page(rows, None, self)
+        if forward:
+            return self._set_cursors(page, rows, values is not None, has_more)
+        return self._set_cursors(page, rows, has_more, direction == PREVIOUS)
+
+    def last_page(self):
+        """Последняя номерная страница — остаток `count % per_page`, как
+        при листании вперед, а не полные per_page строк с конца."""
+        size = self.count % self.per_page or self.per_page
+        rows = list(self.object_list.reverse()[:size])
+        rows.reverse()
+        page = Page(rows, self.num_pages, self)
+        return self._set_cursors(page, rows, self.count > size, False)
+
+
+def page_window(number, num_pages, on_each_side=PAGE_WINDOW,
+                on_ends=PAGE_ENDS):
+    """Номера страниц для навигации: края, окно вокруг `number` и
+    ELLIPSIS на месте пропусков. Пропуск в одну страницу заменяется ее
+    номером. Длина не зависит от num_pages."""
+    shown = {
+        *range(1, min(on_ends, num_pages) + 1),
+        *range(max(num_pages - on_ends + 1, 1), num_pages + 1),
+        *range(max(number - on_each_side, 1),
+               min(number + on_each_side, num_pages) + 1),
+    }
+    window = []
+    previous = 0
+    for current in sorted(shown):
+        if current - previous == 2:
+            window.append(previous + 1)
+        elif current - previous > 2:
+            window.append(ELLIPSIS)
+        window.append(current)
+        previous = current
+    return window
+
+
+def page_links(page, path):
+    """Ссылки навигации страницы CursorPaginator для posts/paginator.html.
+
+    Номера (окном, см. page_window) — только у страниц `?page=N`;
+    вперед и назад обе навигации листают по курсору. Если страница
+    единственная, ссылок нет.
+    """
+    if not (page.previous_cursor or page.next_cursor):
+        return []
+    links = []
+    if page.previous_cursor:
+        links += [
+            PageLink('Первая', '?page=1' if page.number else path, False),
+            PageLink('Предыдущая', f'?cursor={page.previous_cursor}', False),
+        ]
+    if page.number:
+        for number in page_window(page.number, page.paginator.num_pages):
+            if number == ELLIPSIS:
+                links.append(PageLink(ELLIPSIS, None, False))
+            else:
+                links.append(PageLink(
+                    str(number), f'?page={number}', number == page.number
+                ))
+    if page.next_cursor:
+        if page.number:
+            last = f'?page={page.paginator.num_pages}'
+        else:
+            last = f'?cursor={page.paginator.last_cursor}'
+        links += [
+            PageLink('Следующая', f'?cursor={page.next_cursor}', False),
+            PageLink('Последняя', last, False),
+        ]
+    return links
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который кеширует COUNT(*) на COUNT_CACHE_TIMEOUT.
+
+    Для больших таблиц точное число строк не нужно на каждом запросе:
+    счетчик страниц может немного отставать, зато COUNT по всей таблице
+    выполняется раз в несколько минут на каждый набор фильтров.
+    """
+
+    @cached_property
+    def count(self):
+        try:
+            sql, params = self.object_list.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'paginator-count:' + hashlib.md5(
+            f'{sql}{params!r}'.encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = Paginator.count.func(self)
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
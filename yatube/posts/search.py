@@ -0,0 +1,152 @@
+import re
+
+from django.db import connection
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Group, Post, User
+from .paginators import InvalidCursor
+
+SEARCH_TABLE: str = 'posts_post_fts'
+
+# Полнотекстовый индекс над posts_post (external content) и триггеры,
+# которые держат его в синхроне с Post.text.
+SEARCH_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+)
+
+
+def search_supported():
+    return connection.vendor == 'sqlite'
+
+
+def install_search_index():
+    """Создает индекс и триггеры, если их нет, и заполняет индекс заново.
+
+    SQLite теряет триггеры, когда миграция пересоздает posts_post,
+    поэтому команда rebuild_search_index вызывает эту функцию повторно.
+    """
+    with connection.cursor() as cursor:
+        for statement in SEARCH_SCHEMA:
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def match_query(text):
+    """Строка поиска в запрос FTS5: все слова обязательны, последнее —
+    по префиксу. Пустая строка, если слов нет."""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def encode_search_cursor(rank, pk):
+    return urlsafe_base64_encode(f'{rank!r}|{pk}'.encode())
+
+
+def decode_search_cursor(token):
+    try:
+        rank, pk = force_str(urlsafe_base64_decode(token)).split('|')
+        return float(rank), int(pk)
+    except (TypeError, ValueError):
+        raise InvalidCursor(token)
+
+
+def _ranked_ids(match, group, author, after, limit):
+    """(id, ранг) найденных постов: лучший ранг первым, при равном —
+    новые посты первыми. `after` — ключ последней строки прошлой
+    страницы."""
+    sql = [
+        f'SELECT p.id, {SEARCH_TABLE}.rank FROM {SEARCH_TABLE}',
+        f'JOIN posts_post p ON p.id = {SEARCH_TABLE}.rowid',
+        f'WHERE {SEARCH_TABLE} MATCH %s',
+    ]
+    params = [match]
+    if group:
+        sql.append(
+            f'AND p.group_id = (SELECT id FROM {Group._meta.db_table} '
+            'WHERE slug = %s)'
+        )
+        params.append(group)
+    if author:
+        sql.append(
+            f'AND p.author_id = (SELECT id FROM {User._meta.db_table} '
+            'WHERE username = %s)'
+        )
+        params.append(author)
+    if after is not None:
+        sql.append(
+            f'AND ({SEARCH_TABLE}.rank > %s '
+            f'OR ({SEARCH_TABLE}.rank = %s AND p.id < %s))'
+        )
+        params += [after[0], after[0], after[1]]
+    sql.append(f'ORDER BY {SEARCH_TABLE}.rank, p.id DESC LIMIT %s')
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(' '.join(sql), params)
+        return cursor.fetchall()
+
+
+def _fallback_ids(text, group, author, after, limit):
+    """Без FTS5: поиск по вхождению, новые посты первыми."""
+    posts = Post.objects.filter(text__icontains=text).order_by('-pk')
+    if group:
+        posts = posts.filter(group__slug=group)
+    if author:
+        posts = posts.filter(author__username=author)
+    if after is not None:
+        posts = posts.filter(pk__lt=after[1])
+    return [(pk, 0.0) for pk in posts.values_list('pk', flat=True)[:limit]]
+
+
+def search_posts(text, group=None, author=None, cursor=None, limit=10):
+    """Посты по запросу и курсор следующей страницы (или None)."""
+    after = decode_search_cursor(cursor) if cursor else None
+    if not search_supported():
+        rows = _fallback_ids(text, group, author, after, limit + 1)
+    elif match_query(text):
+        rows = _ranked_ids(
+            match_query(text), group, author, after, limit + 1
+        )
+    else:
+        rows = []
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        pk, rank = rows[-1]
+        next_cursor = encode_search_cursor(rank, pk)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, _ in rows]
+    )
+    return [posts[pk] for pk, _ in rows if pk in posts], next_cursor
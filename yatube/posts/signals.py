@@ -0,0 +1,281 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.tasks import run_in_background
+from users.models import Profile
+
+from .cards import card_key
+from .feed_cache import invalidate_feeds, invalidate_post_pages
+from .follow_graph import follow_graph
+from .models import Comment, Follow, Group, Post, User
+from .thumbnails import generate_card_variants
+from .timeline import backfill_timeline, fan_out_post, trim_timeline
+
+
+def change_posts_count(model, delta, **lookup):
+    """Сдвигает денормализованный счетчик постов на delta."""
+    rows = model.objects.filter(**lookup)
+    if delta < 0:
+        rows = rows.filter(posts_count__gte=-delta)
+    rows.update(posts_count=F('posts_count') + delta)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    instance._old_group_id = None
+    instance._old_image = ''
+    # Новый файл еще не записан: FileField сохранит его позже, при
+    # записи строки, и хранилище добавит ему ссылку.
+    instance._image_uploaded = bool(instance.image) and (
+        not instance.image._committed
+    )
+    if not raw and not instance._state.adding:
+        instance._old_group_id, instance._old_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first()
+        ) or (None, '')
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        change_posts_count(Profile, 1, user=instance.author_id)
+        run_in_background(fan_out_post, instance.pk)
+    elif instance._old_group_id == instance.group_id:
+        return
+    elif instance._old_group_id is not None:
+        change_posts_count(Group, -1, pk=instance._old_group_id)
+    if instance.group_id is not None:
+        change_posts_count(Group, 1, pk=instance.group_id)
+
+
+@receiver(post_save, sender=Post)
+def render_post_thumbnail(sender, instance, raw=False, **kwargs):
+    """Варианты карточки рисуются в фоне сразу после загрузки."""
+    if not raw and instance.image:
+        run_in_background(generate_card_variants, instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    """Замененная картинка теряет ссылку (см. ContentAddressedStorage).
+
+    Загрузка того же содержимого дает то же имя, но ссылку хранилище
+    уже добавило — старую все равно нужно отпустить.
+    """
+    if not raw and instance._old_image and (
+            instance._image_uploaded
+            or instance._old_image != instance.image.name):
+        instance.image.storage.delete(instance._old_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        instance.image.storage.delete(instance.image.name)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_posts_count(Profile, -1, user=instance.author_id)
+    if instance.group_id is not None:
+        change_posts_count(Group, -1, pk=instance.group_id)
+
+
+@receiver(post_delete, sender=Post)
+def drop_post_card(sender, instance, **kwargs):
+    cache.delete(card_key(instance))
+
+
+def group_feeds(*group_ids):
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+    return [f'group:{slug}' for slug in slugs]
+
+
+def post_feeds(post):
+    """Ленты, в которых выводится пост."""
+    return [
+        'index',
+        f'profile:{post.author.username}',
+        *group_feeds(post.group_id),
+    ]
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, created, raw=False, **kwargs):
+    """Новый пост сдвигает все страницы своих лент, правка — только свои.
+
+    Переход в другую группу меняет состав обеих групп.
+    """
+    if raw:
+        return
+    if created:
+        invalidate_feeds(*post_feeds(instance))
+        return
+    if instance._old_group_id != instance.group_id:
+        invalidate_feeds(
+            *group_feeds(instance._old_group_id, instance.group_id)
+        )
+    invalidate_post_pages(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    invalidate_feeds(*post_feeds(instance))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    invalidate_post_pages(instance.post_id)
+
+
+def old_values(model, instance, fields, update_fields):
+    """Прежние значения полей, если хоть одно из них меняется."""
+    if instance._state.adding:
+        return None
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return None
+    old = model.objects.filter(pk=instance.pk).values(*fields).first()
+    if old is None or all(
+            old[field] == getattr(instance, field) for field in fields):
+        return None
+    return old
+
+
+def touch_posts(posts):
+    """Меняет версию карточек постов и после коммита сбрасывает ленты,
+    где они выводятся."""
+    authors = posts.values_list('author__username', flat=True).distinct()
+    groups = posts.exclude(group=None).values_list(
+        'group__slug', flat=True
+    ).distinct()
+    feeds = [
+        'index',
+        *(f'profile:{username}' for username in authors),
+        *(f'group:{slug}' for slug in groups),
+    ]
+    posts.update(updated=timezone.now())
+    transaction.on_commit(lambda: invalidate_feeds(*feeds))
+
+
+@receiver(pre_save, sender=Group)
+def remember_group(sender, instance, raw=False, update_fields=None,
+                   **kwargs):
+    """Прежние поля группы — для touch_group_posts после сохранения."""
+    instance._old_values = None if raw else old_values(
+        Group, instance, ('title', 'slug', 'description'), update_fields
+    )
+
+
+@receiver(post_save, sender=Group)
+def touch_group_posts(sender, instance, created, raw=False, **kwargs):
+    """Правка группы сбрасывает ее страницу, переименование — и карточки.
+
+    Все это — только если сохранение дошло до коммита.
+    """
+    if raw:
+        return
+    old = getattr(instance, '_old_values', None)
+    feeds = {f'group:{instance.slug}'}
+    if old is not None:
+        feeds.add(f'group:{old["slug"]}')
+        if (old['title'], old['slug']) != (instance.title, instance.slug):
+            touch_posts(instance.posts.all())
+    transaction.on_commit(lambda: invalidate_feeds(*feeds))
+
+
+@receiver(pre_delete, sender=Group)
+def touch_deleted_group_posts(sender, instance, **kwargs):
+    touch_posts(instance.posts.all())
+
+
+@receiver(pre_save, sender=User)
+def remember_author(sender, instance, raw=False, update_fields=None,
+                    **kwargs):
+    """Прежние имена автора — для touch_author_posts после сохранения."""
+    instance._old_values = None if raw else old_values(
+        User, instance, ('username', 'first_name', 'last_name'),
+        update_fields
+    )
+
+
+@receiver(post_save, sender=User)
+def touch_author_posts(sender, instance, created, raw=False, **kwargs):
+    """Смена имени автора меняет версию карточек его постов."""
+    old = getattr(instance, '_old_values', None)
+    if raw or old is None:
+        return
+    touch_posts(instance.posts.all())
+    transaction.on_commit(
+        lambda: invalidate_feeds(f'profile:{old["username"]}')
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_new_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        invalidate_feeds(f'profile:{instance.username}')
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_profile(sender, instance, **kwargs):
+    invalidate_feeds(f'profile:{instance.username}')
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follower_timeline(sender, instance, created, raw=False,
+                               **kwargs):
+    if created and not raw:
+        backfill_timeline(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def trim_follower_timeline(sender, instance, **kwargs):
+    trim_timeline(instance.user_id, [instance.author_id])
+
+
+@receiver(post_save, sender=Follow)
+def add_follow_edge(sender, instance, created, **kwargs):
+    if created:
+        follow_graph.changed(added=[(instance.user_id, instance.author_id)])
+    else:
+        follow_graph.invalidate()
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_edge(sender, instance, **kwargs):
+    follow_graph.changed(removed=[(instance.user_id, instance.author_id)])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_followed_profile(sender, instance, raw=False, **kwargs):
+    """Кнопка подписки на странице автора и счетчик подписок на странице
+    подписчика меняют вид. Массовая отписка (follows.unfollow_many)
+    делает то же без сигналов."""
+    if raw:
+        return
+    usernames, missing = [], []
+    for name in ('author', 'user'):
+        if Follow._meta.get_field(name).is_cached(instance):
+            usernames.append(getattr(instance, name).username)
+        else:
+            missing.append(getattr(instance, f'{name}_id'))
+    if missing:
+        # Удаление через queryset не загружает связи: имена — одним
+        # запросом.
+        usernames += User.objects.filter(pk__in=missing).values_list(
+            'username', flat=True
+        )
+    invalidate_feeds(*(f'profile:{name}' for name in usernames))
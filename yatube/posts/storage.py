@@ -0,0 +1,96 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+HASH_CHUNK: int = 64 * 1024
+# Уровней каталогов по префиксу хеша: posts/ab/cd/abcd….gif.
+SHARD_LEVELS: int = 2
+
+
+def content_hash(content):
+    """sha256 содержимого файла; файл читается кусками."""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы с именем по хешу содержимого: одинаковые картинки хранятся
+    один раз.
+
+    `save()` возвращает `<каталог>/ab/cd/<sha256>.<расширение>` — по
+    SHARD_LEVELS подкаталогов из префикса хеша, чтобы ни в одном
+    каталоге не было миллионов файлов. Если такой файл уже есть, он не
+    перезаписывается, а счетчик ссылок (StoredFile) растет. `delete()`
+    уменьшает счетчик и убирает файл с его миниатюрами, только когда
+    ссылок не осталось, и только после коммита транзакции.
+    """
+
+    def hashed_name(self, name, digest):
+        """`<каталог name>/ab/cd/<digest>.<расширение>`."""
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        shards = [digest[2 * i:2 * i + 2] for i in range(SHARD_LEVELS)]
+        return os.path.join(directory, *shards, digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content_hash(content))
+        self.add_reference(name)
+        if not self.exists(name):
+            saved = self._save(name, content)
+            if saved != name:
+                # Тот же файл успели записать параллельно — копия не нужна.
+                super().delete(saved)
+        return name.replace('\\', '/')
+
+    def add_reference(self, name, count=1):
+        from .models import StoredFile
+
+        with transaction.atomic():
+            stored, created = StoredFile.objects.get_or_create(
+                name=name, defaults={'refs': count}
+            )
+            if not created:
+                StoredFile.objects.filter(pk=stored.pk).update(
+                    refs=F('refs') + count
+                )
+
+    def delete(self, name):
+        from .models import StoredFile
+
+        with transaction.atomic():
+            StoredFile.objects.filter(name=name, refs__gt=0).update(
+                refs=F('refs') - 1
+            )
+            deleted, _ = StoredFile.objects.filter(
+                name=name, refs__lte=0
+            ).delete()
+        if deleted:
+            transaction.on_commit(lambda: self.remove_unreferenced(name))
+
+    def remove_unreferenced(self, name):
+        """Удаляет файл и его миниатюры, если на него снова не сослались."""
+        from .models import StoredFile
+
+        if StoredFile.objects.filter(name=name).exists():
+            return
+        default.kvstore.delete(ImageFile(name, self))
+        super().delete(name)
+
+
+post_image_storage = ContentAddressedStorage()
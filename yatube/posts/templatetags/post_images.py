@@ -0,0 +1,14 @@
+from django import template
+
+from posts.thumbnails import picture_sources
+
+register = template.Library()
+
+CARD_SIZES: str = '(max-width: 960px) 100vw, 960px'
+
+
+@register.inclusion_tag('includes/picture.html')
+def card_picture(image):
+    context = picture_sources(image)
+    context['sizes'] = CARD_SIZES
+    return context
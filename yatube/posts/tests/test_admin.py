@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'admin_{i}', description='Описание'
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def create_posts(self, count):
+        start = Post.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f'admin_author_{i}')
+            Post.objects.create(
+                author=author, text=f'Пост {i}', group=self.groups[i % 3]
+            )
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов не зависит от числа строк на странице."""
+        self.create_posts(2)
+        cache.clear()
+        few = self.changelist_queries()
+        self.create_posts(12)
+        cache.clear()
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_count_is_cached(self):
+        """COUNT берется из кеша, пока он не устарел."""
+        self.create_posts(2)
+        self.client.get(self.url)
+        Post.objects.all().delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_date_hierarchy(self):
+        """Навигация по датам фильтрует список."""
+        self.create_posts(1)
+        post = Post.objects.get()
+        response = self.client.get(self.url, {
+            'pub_date__year': post.pub_date.year,
+            'pub_date__month': post.pub_date.month,
+        })
+        self.assertEqual(list(response.context['cl'].result_list), [post])
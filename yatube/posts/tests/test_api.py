@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.views import COMMENTS_Q, POSTS_Q
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api_slug', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}',
+                group=cls.group if i % 2 else None,
+            )
+            for i in range(POSTS_Q + 3)
+        ]
+        cls.post = cls.posts[0]
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text=f'Ответ {i}')
+            for i in range(COMMENTS_Q + 1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feed_pages_by_cursor(self):
+        """Лента отдается страницами по курсору."""
+        url = reverse('posts:api_posts')
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), POSTS_Q)
+        self.assertIsNone(first['previous'])
+        self.assertEqual(first['results'][0], {
+            'id': self.posts[-1].pk,
+            'text': self.posts[-1].text,
+            'pub_date': first['results'][0]['pub_date'],
+            'updated': first['results'][0]['updated'],
+            'author': 'api_author',
+            'group': None,
+            'image': None,
+        })
+        second = self.client.get(url, {'cursor': first['next']}).json()
+        self.assertEqual(
+            [row['id'] for row in second['results']],
+            [post.pk for post in reversed(self.posts[:3])],
+        )
+        self.assertIsNone(second['next'])
+
+    def test_sparse_fields_without_models(self):
+        """Только запрошенные поля и без экземпляров моделей."""
+        url = reverse('posts:api_group_posts', args=(self.group.slug,))
+        with mock.patch.object(Post, 'from_db', side_effect=AssertionError):
+            response = self.client.get(url, {'fields': 'id,group'})
+        for row in response.json()['results']:
+            self.assertEqual(set(row), {'id', 'group'})
+            self.assertEqual(row['group'], self.group.slug)
+
+    def test_errors(self):
+        """Неизвестное поле, курсор, группа и гость в ленте подписок."""
+        cases = (
+            (reverse('posts:api_posts'), {'fields': 'id,secret'}, 400,
+             'fields'),
+            (reverse('posts:api_posts'), {'cursor': 'broken'}, 400,
+             'cursor'),
+            (reverse('posts:api_group_posts', args=('missing',)), {}, 404,
+             '__all__'),
+            (reverse('posts:api_follow_posts'), {}, 401, '__all__'),
+        )
+        for url, params, status, field in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn(field, response.json()['errors'])
+
+    def test_follow_feed(self):
+        """Лента подписок — посты авторов, на которых подписан читатель."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(
+            reverse('posts:api_follow_posts'), {'fields': 'id'}
+        )
+        self.assertEqual(
+            [row['id'] for row in response.json()['results']],
+            [post.pk for post in reversed(self.posts[3:])],
+        )
+
+    def test_post_and_comments(self):
+        """Пост и его комментарии, от старых к новым."""
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=(self.post.pk,)),
+            {'fields': 'text,author'},
+        )
+        self.assertEqual(
+            response.json(), {'text': 'Пост 0', 'author': 'api_author'}
+        )
+        comments = self.client.get(
+            reverse('posts:api_post_comments', args=(self.post.pk,))
+        ).json()
+        self.assertEqual(len(comments['results']), COMMENTS_Q)
+        self.assertEqual(comments['results'][0]['text'], 'Ответ 0')
+        self.assertEqual(comments['results'][0]['author'], 'api_reader')
+        self.assertIsNotNone(comments['next'])
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:api_post_detail', args=(0,))
+            ).status_code,
+            404,
+        )
@@ -1,12 +1,16 @@
+import hashlib
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from core.uploads import strip_exif, strip_jpeg_exif
 from posts.forms import PostForm
 from posts.models import Group, Post
 
@@ -115,8 +119,103 @@ class PostFormTests(TestCase):
             data=form_data,
             follow=True
         )
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(Post.objects.filter(
             text='пост с картинкой',
             group=self.group.pk,
-            image='posts/small.gif'
+            image=f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
         ).exists())
+
+
+@override_settings(MEDIA_ROOT=settings.MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def jpeg(self, size=(4, 2)):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Камера'
+        buffer = BytesIO()
+        Image.new('RGB', size).save(buffer, 'JPEG', exif=exif.tobytes())
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                                  'image/jpeg')
+
+    def post(self, image):
+        return self.client.post(
+            reverse('posts:post_create'), {'text': 'Фото', 'image': image}
+        )
+
+    def test_exif_is_stripped_but_orientation_kept(self):
+        """Из EXIF остается только ориентация."""
+        self.post(self.jpeg())
+        post = Post.objects.get(text='Фото')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(dict(image.getexif()), {0x0112: 6})
+            self.assertEqual(image.size, (4, 2))
+
+    def test_exif_stripped_whatever_content_type(self):
+        """JPEG узнается по содержимому, а не по Content-Type клиента."""
+        for content_type in ('application/octet-stream', 'image/jpg'):
+            with self.subTest(content_type=content_type):
+                upload = self.jpeg()
+                upload.content_type = content_type
+                with Image.open(strip_exif(upload)) as image:
+                    self.assertEqual(dict(image.getexif()), {0x0112: 6})
+
+    def test_fill_bytes_before_marker(self):
+        """Байты-заполнители 0xFF перед маркером не мешают вырезать EXIF."""
+        data = self.jpeg().read()
+        padded = data[:2] + b'\xff\xff\xff' + data[2:]
+        target = BytesIO()
+        self.assertTrue(strip_jpeg_exif(BytesIO(padded), target))
+        target.seek(0)
+        with Image.open(target) as image:
+            self.assertEqual(dict(image.getexif()), {0x0112: 6})
+
+    def test_malformed_jpeg_kept_as_is(self):
+        """Битый заголовок — загрузка остается как была, без 500."""
+        cases = {
+            'обрезанная длина': b'\xff\xd8\xff\xe1\x00',
+            'длина меньше 2': b'\xff\xd8\xff\xe1\x00\x01' + b'x' * 10,
+            'обрезанный сегмент': b'\xff\xd8\xff\xe1\x00\x10abc',
+            'мусор вместо маркера': b'\xff\xd8\x00\x01\x02',
+            'нет данных': b'\xff\xd8',
+        }
+        for name, content in cases.items():
+            with self.subTest(name):
+                self.assertFalse(
+                    strip_jpeg_exif(BytesIO(content), BytesIO())
+                )
+                upload = SimpleUploadedFile('broken.jpg', content,
+                                            'image/jpeg')
+                self.assertIs(strip_exif(upload), upload)
+                self.assertEqual(upload.read(), content)
+
+    @override_settings(UPLOAD_MAX_SIZE=100)
+    def test_oversized_upload_rejected(self):
+        """Файл больше UPLOAD_MAX_SIZE не сохраняется."""
+        response = self.post(self.jpeg())
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 100\xa0байт.'
+        )
+        self.assertFalse(Post.objects.filter(text='Фото').exists())
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с большим числом пикселей отклоняется по заголовку."""
+        response = self.post(self.jpeg(size=(20, 10)))
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 100 пикселей.'
+        )
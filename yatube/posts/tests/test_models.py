@@ -1,7 +1,23 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
 
-from posts.models import Group, Post, POST_S
+from posts.follow_graph import GRAPH_VERSION_KEY, follow_graph
+from posts.management.commands import dedupe_images
+from posts.models import Follow, Group, Post, POST_S, StoredFile
 
 
 User = get_user_model()
@@ -65,3 +81,341 @@ class GroupModelTest(TestCase):
     def test_group_str(self):
         """Проверка __str__ у group."""
         self.assertEqual(self.group.title, str(self.group))
+
+
+class PostsCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='counter_slug',
+            description='Описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='counter_slug_2',
+            description='Описание',
+        )
+
+    def assertCounters(self, author, group, other_group):
+        self.user.profile.refresh_from_db()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.user.profile.posts_count, author)
+        self.assertEqual(self.group.posts_count, group)
+        self.assertEqual(self.other_group.posts_count, other_group)
+
+    def test_counters_follow_posts(self):
+        """Счетчики меняются при создании, переносе и удалении поста."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        Post.objects.create(author=self.user, text='Без группы')
+        self.assertCounters(2, 1, 0)
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(2, 0, 1)
+        post.delete()
+        self.assertCounters(1, 0, 0)
+
+    def test_rebuild_command(self):
+        """Команда пересчитывает счетчики после bulk_create."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Пост', group=self.group)
+            for _ in range(3)
+        )
+        self.assertCounters(0, 0, 0)
+        call_command('rebuild_post_counters', stdout=StringIO())
+        self.assertCounters(3, 3, 0)
+
+    def test_user_without_profile(self):
+        """Пользователь без профиля (bulk_create, loaddata) не ломает
+        страницы: профиль заводится со счетчиком из базы."""
+        User.objects.bulk_create([User(username='bulk')])
+        author = User.objects.get(username='bulk')
+        post = Post.objects.create(author=author, text='Пост')
+        response = self.client.get(
+            reverse('posts:profile', args=[author.username])
+        )
+        self.assertEqual(response.context['posts_count'], 1)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertEqual(
+            response.context['post'].author.profile.posts_count, 1
+        )
+
+
+class FollowModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        Post.objects.create(author=cls.author, text='Пост')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора невозможна."""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.author)
+
+    def test_explain_feeds(self):
+        """Бенчмарк показывает планы до и после и возвращает индексы."""
+        out = StringIO()
+        call_command('explain_feeds', repeat=1, stdout=out)
+        before, after = out.getvalue().split('После')
+        self.assertNotIn('post_author_date_idx', before)
+        self.assertIn('post_author_date_idx', after)
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'graph_{i}') for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.reset()
+        self.graph = follow_graph
+
+    def test_request_check_is_per_thread(self):
+        """Начало запроса в другом потоке не заставляет этот поток
+        снова сверять версию."""
+        first, second, _ = self.users
+        self.graph.is_following(first.pk, second.pk)
+        thread = threading.Thread(target=self.graph.start_request)
+        thread.start()
+        thread.join()
+        with mock.patch.object(cache, 'get') as cache_get:
+            self.graph.is_following(first.pk, second.pk)
+        cache_get.assert_not_called()
+
+    def test_graph_reloads_on_foreign_change(self):
+        """Новая версия в кеше — граф перечитывается."""
+        first, second, _ = self.users
+        self.assertFalse(self.graph.is_following(first.pk, second.pk))
+        # Подписка «в другом процессе»: сигналы сюда не доходят.
+        Follow.objects.bulk_create([Follow(user=first, author=second)])
+        self.assertFalse(self.graph.is_following(first.pk, second.pk))
+        cache.set(GRAPH_VERSION_KEY, 0)
+        self.graph.start_request()
+        self.assertTrue(self.graph.is_following(first.pk, second.pk))
+
+
+class FollowGraphCommitTest(TransactionTestCase):
+    """Граф и версия в кеше меняются только после коммита."""
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.reset()
+        self.graph = follow_graph
+        self.users = [
+            User.objects.create_user(username=f'graph_{i}') for i in range(3)
+        ]
+
+    def test_graph_answers(self):
+        """Подписки, подписчики и счетчики берутся из графа."""
+        first, second, third = self.users
+        Follow.objects.create(user=first, author=third)
+        # Эти подписки попадают в уже загруженный граф через сигналы.
+        self.graph.follower_ids(third.pk)
+        Follow.objects.create(user=second, author=third)
+        Follow.objects.create(user=first, author=second)
+        self.assertTrue(self.graph.is_following(first.pk, second.pk))
+        self.assertFalse(self.graph.is_following(second.pk, first.pk))
+        self.assertEqual(
+            self.graph.following_ids(first.pk), (second.pk, third.pk)
+        )
+        self.assertEqual(self.graph.follower_ids(third.pk),
+                         (first.pk, second.pk))
+        self.assertEqual(self.graph.followers_count(third.pk), 2)
+        self.assertEqual(self.graph.following_count(third.pk), 0)
+
+    def test_change_applied_in_place(self):
+        """Своя подписка и отписка правят граф без перечитывания."""
+        first, second, _ = self.users
+        self.graph.follower_ids(second.pk)
+        follow = Follow.objects.create(user=first, author=second)
+        self.graph.start_request()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.graph.is_following(first.pk, second.pk))
+        follow.delete()
+        self.graph.start_request()
+        with self.assertNumQueries(0):
+            self.assertFalse(self.graph.is_following(first.pk, second.pk))
+            self.assertEqual(self.graph.followers_count(second.pk), 0)
+
+    def test_commit_bumps_version(self):
+        first, second, _ = self.users
+        version = follow_graph._shared_version()
+        self.assertFalse(follow_graph.is_following(first.pk, second.pk))
+        with transaction.atomic():
+            Follow.objects.create(user=first, author=second)
+            self.assertEqual(cache.get(GRAPH_VERSION_KEY), version)
+            self.assertFalse(
+                follow_graph.is_following(first.pk, second.pk)
+            )
+        self.assertEqual(cache.get(GRAPH_VERSION_KEY), version + 1)
+        self.assertTrue(follow_graph.is_following(first.pk, second.pk))
+
+    def test_rollback_leaves_graph(self):
+        """Граф, прочитанный в откатившейся транзакции, не остается."""
+        first, second, _ = self.users
+        version = follow_graph._shared_version()
+        with transaction.atomic():
+            Follow.objects.create(user=first, author=second)
+            self.assertTrue(
+                follow_graph.is_following(first.pk, second.pk)
+            )
+            transaction.set_rollback(True)
+        self.assertEqual(cache.get(GRAPH_VERSION_KEY), version)
+        follow_graph.start_request()
+        self.assertFalse(
+            follow_graph.is_following(first.pk, second.pk)
+        )
+
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21'
+    b'\xf9\x04\x01\x00\x00\x00\x00\x2c\x00\x00\x00\x00\x01\x00'
+    b'\x01\x00\x00\x02\x01\x00\x00\x3b'
+)
+
+
+class StoredImageTest(TransactionTestCase):
+    """Картинки по хешу содержимого: файл удаляется после коммита,
+    поэтому транзакции здесь настоящие."""
+
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user(username='uploader')
+
+    def files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, filename), self.media)
+            for root, _, filenames in os.walk(
+                os.path.join(self.media, 'posts')
+            )
+            for filename in filenames
+        )
+
+    def legacy_posts(self, *filenames):
+        """Посты со старыми именами файлов, как до хранилища по хешу."""
+        os.makedirs(os.path.join(self.media, 'posts'))
+        for filename in filenames:
+            with open(os.path.join(self.media, 'posts', filename), 'wb') as f:
+                f.write(SMALL_GIF)
+        for filename in filenames[:2]:
+            Post.objects.create(
+                author=self.user, text='Старый пост',
+                image=f'posts/{filename}',
+            )
+
+    def post(self, filename):
+        return Post.objects.create(
+            author=self.user, text='Картинка',
+            image=SimpleUploadedFile(filename, SMALL_GIF, 'image/gif'),
+        )
+
+    def test_same_image_stored_once(self):
+        """Одинаковые картинки — один файл, удаляется с последним постом."""
+        first = self.post('first.gif')
+        second = self.post('second.GIF')
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertRegex(name, r'^posts/(\w\w)/(\w\w)/\1\2\w{60}\.gif$')
+        self.assertEqual(self.files(), [name])
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 2)
+        first.delete()
+        self.assertTrue(second.image.storage.exists(name))
+        second.delete()
+        self.assertFalse(second.image.storage.exists(name))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_same_image_uploaded_again(self):
+        """Повторная загрузка той же картинки в пост не копит ссылки."""
+        post = self.post('first.gif')
+        name = post.image.name
+        post.image = SimpleUploadedFile('again.gif', SMALL_GIF, 'image/gif')
+        post.save()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 1)
+        post.delete()
+        self.assertFalse(post.image.storage.exists(name))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_dedupe_images(self):
+        """Команда сливает старые копии и пересчитывает ссылки."""
+        self.legacy_posts('a.gif', 'b.gif', 'orphan.gif')
+        out = StringIO()
+        call_command('dedupe_images', '--delete-orphans', stdout=out)
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertEqual(self.files(), [name])
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 2)
+        self.assertIn('Переименовано: 2, слито с копиями: 1', out.getvalue())
+
+    def test_dedupe_images_keeps_references(self):
+        """Пересчет правит счетчики на месте и не теряет ссылки."""
+        post = self.post('new.gif')
+        stored = StoredFile.objects.get(name=post.image.name)
+        StoredFile.objects.filter(pk=stored.pk).update(refs=0)
+        # Загрузка, чей пост еще не закоммичен.
+        pending = StoredFile.objects.create(name='posts/pending.gif', refs=1)
+        call_command('dedupe_images', stdout=StringIO())
+        self.assertEqual(StoredFile.objects.get(pk=stored.pk).refs, 1)
+        self.assertEqual(StoredFile.objects.get(pk=pending.pk).refs, 1)
+
+    def test_dedupe_images_interrupted(self):
+        """Посты, уже переведенные на новый файл, держат его счетчик."""
+        self.legacy_posts('a.gif', 'b.gif')
+        with mock.patch.object(
+            dedupe_images.Command, 'count_references',
+            side_effect=KeyboardInterrupt,
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('dedupe_images', stdout=StringIO())
+        name = Post.objects.values_list('image', flat=True)[0]
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 2)
+
+    def test_shard_images(self):
+        """Команда раскладывает старые файлы по префиксу хеша пачками."""
+        self.legacy_posts('a.gif', 'b.gif')
+        out = StringIO()
+        call_command('shard_images', '--batch-size', '1', stdout=out)
+        name = self.post('new.gif').image.name
+        self.assertEqual(
+            set(Post.objects.values_list('image', flat=True)), {name}
+        )
+        self.assertEqual(self.files(), [name])
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 3)
+        self.assertIn('Перенесено: 2', out.getvalue())
+        out = StringIO()
+        call_command('shard_images', stdout=out)
+        self.assertIn('Перенесено: 0', out.getvalue())
+
+    def test_shard_images_keeps_pending_upload(self):
+        """Ссылку загрузки, чей пост еще не закоммичен, перенос не теряет."""
+        self.legacy_posts('a.gif', 'b.gif')
+        storage = Post._meta.get_field('image').storage
+        target = storage.hashed_name(
+            'posts/a.gif', hashlib.sha256(SMALL_GIF).hexdigest()
+        )
+        StoredFile.objects.create(name=target, refs=1)
+        call_command('shard_images', stdout=StringIO())
+        self.assertEqual(StoredFile.objects.get(name=target).refs, 3)
+        self.assertEqual(list(StoredFile.objects.values_list(
+            'name', flat=True
+        )), [target])
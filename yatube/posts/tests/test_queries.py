@@ -0,0 +1,230 @@
+import shutil
+import tempfile
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from core.query_budget import QueryBudgetExceeded, query_budget
+from posts import urls
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+AUTHORS_N: int = 4
+POSTS_PER_AUTHOR: int = 8
+COMMENTS_N: int = 12
+SMALL_GIF: bytes = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTests(TestCase):
+    """Бюджеты запросов всех страниц posts на «живых» данных.
+
+    Данных больше одной страницы, у постов разные авторы и группы,
+    у поста много комментариев разных авторов — любой N+1 вылезет
+    за бюджет. Запись меряется по самому дорогому пути: с картинкой,
+    подписка — на автора с постами.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group_{i}', description='Описание'
+            )
+            for i in range(2)
+        ]
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author_{i}', first_name='Имя', last_name=f'{i}'
+            )
+            for i in range(AUTHORS_N)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            for i in range(POSTS_PER_AUTHOR):
+                Post.objects.create(
+                    author=author,
+                    text=f'Пост {i} автора {author}',
+                    group=cls.groups[i % 2] if i % 3 else None,
+                )
+        cls.author = cls.authors[0]
+        cls.post = Post.objects.filter(author=cls.author).first()
+        # Правка заменяет картинку: снимается ссылка со старой.
+        cls.post.image = cls.image('old.gif')
+        cls.post.save()
+        for i in range(COMMENTS_N):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.authors[i % AUTHORS_N],
+                text=f'Комментарий {i}',
+            )
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.newcomer = User.objects.create_user(username='newcomer')
+        for author in (cls.stranger, cls.newcomer):
+            for i in range(2):
+                Post.objects.create(author=author, text=f'Пост {i}')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @staticmethod
+    def image(name):
+        return SimpleUploadedFile(
+            name, SMALL_GIF + name.encode(), content_type='image/gif'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def routes(self):
+        """(имя маршрута, клиент, метод, url, данные) для каждой страницы."""
+        group = self.groups[0]
+        post_id = self.post.pk
+        # Перенос поста в другую группу — самая дорогая правка.
+        other_group = next(
+            item for item in self.groups if item.pk != self.post.group_id
+        )
+        return [
+            ('index', self.guest_client, 'get',
+             reverse('posts:index'), None),
+            ('index', self.reader_client, 'get',
+             reverse('posts:index') + '?page=2', None),
+            ('group_list', self.reader_client, 'get',
+             reverse('posts:group_list', args=(group.slug,)), None),
+            ('group_list', self.guest_client, 'get',
+             reverse('posts:group_list', args=(group.slug,)) + '?page=2',
+             None),
+            ('profile', self.reader_client, 'get',
+             reverse('posts:profile', args=(self.author.username,)), None),
+            ('post_detail', self.reader_client, 'get',
+             reverse('posts:post_detail', args=(post_id,)), None),
+            ('post_comments', self.reader_client, 'get',
+             reverse('posts:post_comments', args=(post_id,)), None),
+            ('post_create', self.author_client, 'get',
+             reverse('posts:post_create'), None),
+            ('post_create', self.author_client, 'post',
+             reverse('posts:post_create'),
+             {'text': 'Новый пост', 'group': group.pk,
+              'image': self.image('new.gif')}),
+            ('post_edit', self.author_client, 'get',
+             reverse('posts:post_edit', args=(post_id,)), None),
+            ('post_edit', self.author_client, 'post',
+             reverse('posts:post_edit', args=(post_id,)),
+             {'text': 'Правка', 'group': other_group.pk,
+              'image': self.image('edit.gif')}),
+            ('add_comment', self.reader_client, 'post',
+             reverse('posts:add_comment', args=(post_id,)),
+             {'text': 'Еще комментарий'}),
+            ('follow_index', self.reader_client, 'get',
+             reverse('posts:follow_index'), None),
+            ('follow_index', self.reader_client, 'get',
+             reverse('posts:follow_index') + '?page=2', None),
+            ('follow_bulk', self.reader_client, 'post',
+             reverse('posts:follow_bulk'),
+             {'usernames': f'{self.newcomer.username}, nobody'}),
+            ('search', self.guest_client, 'get',
+             reverse('posts:search') + '?q=пост', None),
+            ('profile_follow', self.reader_client, 'get',
+             reverse('posts:profile_follow', args=(self.stranger.username,)),
+             None),
+            ('profile_unfollow', self.reader_client, 'get',
+             reverse('posts:profile_unfollow', args=(self.author.username,)),
+             None),
+            ('api_posts', self.guest_client, 'get',
+             reverse('posts:api_posts'), None),
+            ('api_post_detail', self.guest_client, 'get',
+             reverse('posts:api_post_detail', args=(post_id,)), None),
+            ('api_post_comments', self.guest_client, 'get',
+             reverse('posts:api_post_comments', args=(post_id,)), None),
+            ('api_group_posts', self.guest_client, 'get',
+             reverse('posts:api_group_posts', args=(group.slug,)), None),
+            ('api_profile_posts', self.guest_client, 'get',
+             reverse('posts:api_profile_posts', args=(self.author.username,)),
+             None),
+            ('api_follow_posts', self.reader_client, 'get',
+             reverse('posts:api_follow_posts'), None),
+        ]
+
+    def test_every_route_has_budget(self):
+        """У каждой вьюхи posts объявлен бюджет запросов."""
+        for pattern in urls.urlpatterns:
+            with self.subTest(name=pattern.name):
+                self.assertTrue(hasattr(pattern.callback, 'query_budget'))
+
+    def test_every_route_is_measured(self):
+        """Каждый маршрут posts проверяется на бюджет."""
+        measured = {name for name, *_ in self.routes()}
+        self.assertEqual(
+            measured, {pattern.name for pattern in urls.urlpatterns}
+        )
+
+    def test_routes_within_budget(self):
+        """Страницы укладываются в бюджет при холодном кеше.
+
+        Считает сам query_budget в строгом режиме: фоновые задачи, которые
+        в тестах выполняются в запросе, в бюджет не входят.
+        """
+        for name, client, method, url, data in self.routes():
+            self.assertTrue(resolve(urlsplit(url).path).func.query_budget)
+            with self.subTest(name=name, method=method, url=url):
+                cache.clear()
+                error = None
+                with CaptureQueriesContext(connection) as queries:
+                    try:
+                        getattr(client, method)(url, data)
+                    except QueryBudgetExceeded as exceeded:
+                        error = exceeded
+                if error is not None:
+                    self.fail('\n'.join(
+                        [str(error)] + [query['sql'] for query in queries]
+                    ))
+
+
+class QueryBudgetDecoratorTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    @staticmethod
+    def view(request):
+        list(User.objects.all())
+        return HttpResponse()
+
+    def test_budget_is_declared(self):
+        """Лимит доступен у обернутой вьюхи."""
+        self.assertEqual(query_budget(3)(self.view).query_budget, 3)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_mode_raises(self):
+        """В строгом режиме превышение бюджета — ошибка."""
+        with self.assertRaises(QueryBudgetExceeded):
+            query_budget(0)(self.view)(self.request)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_production_mode_logs(self):
+        """Без строгого режима превышение только пишется в лог."""
+        with self.assertLogs('core.query_budget', 'WARNING'):
+            query_budget(0)(self.view)(self.request)
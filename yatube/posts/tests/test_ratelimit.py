@@ -0,0 +1,111 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.ratelimit import hit, release
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(RATE_LIMITS={
+    'post_create': {'user': '2/m', 'ip': '3/m'},
+    'login': {'ip': '2/m'},
+})
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='limited')
+        cls.other = User.objects.create_user(username='neighbour')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_post_create_limited_per_user(self):
+        """Сверх лимита — 429 с Retry-After, пост не создается."""
+        url = reverse('posts:post_create')
+        for i in range(2):
+            self.authorized_client.post(url, {'text': f'Пост {i}'})
+        response = self.authorized_client.post(url, {'text': 'Лишний'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertFalse(Post.objects.filter(text='Лишний').exists())
+        self.assertEqual(
+            self.authorized_client.get(url).status_code, 200,
+            'GET формы лимитом не считается',
+        )
+
+    def test_post_create_limited_per_ip(self):
+        """Лимит на IP общий для всех пользователей с этого адреса."""
+        url = reverse('posts:post_create')
+        for i in range(2):
+            self.authorized_client.post(url, {'text': f'Пост {i}'})
+        other_client = Client()
+        other_client.force_login(self.other)
+        self.assertEqual(
+            other_client.post(url, {'text': 'Сосед'}).status_code, 302
+        )
+        self.assertEqual(
+            other_client.post(url, {'text': 'Лишний'}).status_code, 429
+        )
+
+    def test_login_limited_per_ip(self):
+        """Перебор паролей отсекается до проверки пароля."""
+        url = reverse('users:login')
+        credentials = {'username': 'limited', 'password': 'wrong'}
+        for _ in range(2):
+            self.assertEqual(
+                self.client.post(url, credentials).status_code, 200
+            )
+        response = self.client.post(url, credentials)
+        self.assertEqual(response.status_code, 429)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    @override_settings(
+        RATELIMIT_IP_META='HTTP_X_FORWARDED_FOR', RATELIMIT_PROXY_HOPS=1
+    )
+    def test_spoofed_forwarded_for(self):
+        """Подставленное клиентом начало X-Forwarded-For лимит не обходит."""
+        url = reverse('users:login')
+        credentials = {'username': 'limited', 'password': 'wrong'}
+        statuses = [
+            self.client.post(
+                url, credentials,
+                HTTP_X_FORWARDED_FOR=f'10.0.0.{i}, 203.0.113.7',
+            ).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_sliding_window(self):
+        """Прошлый период учитывается с весом непрошедшей доли."""
+        key, period = 'ratelimit:test', 60
+        for _ in range(4):
+            self.assertEqual(hit(key, 4, period, now=600), 0)
+        self.assertTrue(hit(key, 4, period, now=630))
+        release(key, period, now=630)
+        self.assertEqual(hit(key, 4, period, now=660), 60)
+        release(key, period, now=660)
+        self.assertEqual(hit(key, 4, period, now=675), 0)
+
+    def test_concurrent_hits(self):
+        """Из одновременных запросов проходят не больше лимита."""
+        barrier = threading.Barrier(8)
+        waits = []
+
+        def request():
+            barrier.wait()
+            waits.append(hit('ratelimit:burst', 3, 60, now=600))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(waits.count(0), 3)
@@ -0,0 +1,87 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+
+from yatube import settings_production
+
+CSS = b'body { color: black; }\n' * 200
+
+
+class StaticFilesTests(TestCase):
+    """collectstatic с хешами и сжатием и раздача без DEBUG."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        source = os.path.join(cls.tmp, 'static')
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'wb') as css:
+            css.write(CSS)
+        cls.settings = override_settings(
+            STATICFILES_DIRS=[source],
+            STATIC_ROOT=os.path.join(cls.tmp, 'root'),
+            STATICFILES_STORAGE=settings_production.STATICFILES_STORAGE,
+            MIDDLEWARE=settings_production.MIDDLEWARE,
+        )
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.tmp, 'root', 'staticfiles.json')) as f:
+            cls.hashed = json.load(f)['paths']['css/site.css']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_hashed_name_compressed(self):
+        """У хешированного файла есть сжатая копия."""
+        self.assertNotEqual(self.hashed, 'css/site.css')
+        path = os.path.join(self.tmp, 'root', self.hashed + '.gz')
+        with gzip.open(path) as compressed:
+            self.assertEqual(compressed.read(), CSS)
+
+    def test_hashed_name_served_forever(self):
+        """Хешированный файл отдается сжатым и кешируется на год."""
+        response = Client().get(
+            f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), CSS
+        )
+
+    def test_plain_name_short_cache(self):
+        """Имя без хеша кешируется ненадолго, без сжатия — как есть."""
+        response = Client().get('/static/css/site.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(b''.join(response.streaming_content), CSS)
+
+    def test_missing_file_keeps_pages(self):
+        """Файл не из манифеста — ссылка без хеша, страница живет."""
+        with self.assertLogs('core.staticfiles', 'WARNING'):
+            response = Client().get('/about/author/')
+        self.assertContains(
+            response, f'href="{settings.STATIC_URL}css/bootstrap.min.css"'
+        )
+
+
+class FaviconTests(TestCase):
+    def test_favicons_use_static_url(self):
+        """Ссылки на фавиконки не зависят от адреса страницы."""
+        response = Client().get('/about/author/')
+        self.assertContains(
+            response, f'href="{settings.STATIC_URL}img/fav/fav.ico"'
+        )
+        self.assertNotContains(response, 'href="img/fav/')
@@ -0,0 +1,60 @@
+import threading
+from unittest import mock
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from core import tasks
+
+
+@override_settings(BACKGROUND_WORKERS=1)
+class BackgroundTasksTest(TransactionTestCase):
+    def setUp(self):
+        # Свой пул на тест: один поток, задачи идут по очереди.
+        patcher = mock.patch.object(tasks, '_executor', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.shutdown)
+        self.done = []
+
+    def shutdown(self):
+        if tasks._executor is not None:
+            tasks._executor.shutdown(wait=True)
+
+    def drain(self):
+        """Ждет задачи, уже отправленные в пул."""
+        tasks._get_executor().submit(lambda: None).result(timeout=10)
+
+    def record(self, value):
+        self.done.append((value, threading.current_thread().name))
+
+    def test_task_runs_after_commit_in_pool(self):
+        """Задача уходит в пул только после коммита транзакции."""
+        with transaction.atomic():
+            tasks.run_in_background(self.record, 'после коммита')
+            self.assertEqual(self.done, [])
+        self.drain()
+        self.assertEqual(len(self.done), 1)
+        value, thread = self.done[0]
+        self.assertEqual(value, 'после коммита')
+        self.assertTrue(thread.startswith('yatube-task'))
+
+    def test_rolled_back_task_is_dropped(self):
+        """Откаченная транзакция не запускает задачу."""
+        with transaction.atomic():
+            tasks.run_in_background(self.record, 'откат')
+            transaction.set_rollback(True)
+        self.drain()
+        self.assertEqual(self.done, [])
+
+    def test_failing_task_is_logged(self):
+        """Ошибка задачи пишется в лог и не останавливает пул."""
+        def fail():
+            raise RuntimeError('сбой')
+
+        with self.assertLogs('core.tasks', 'ERROR') as logs:
+            tasks.run_in_background(fail)
+            tasks.run_in_background(self.record, 'следующая')
+            self.drain()
+        self.assertIn('fail', logs.output[0])
+        self.assertEqual([value for value, _ in self.done], ['следующая'])
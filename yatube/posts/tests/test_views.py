@@ -1,15 +1,38 @@
+import hashlib
 import shutil
 import tempfile
+import threading
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection
+from django.db import transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
 
-from posts.models import Group, Post, Comment, Follow, User
+from core import tasks
+from posts.cards import render_cards
+from posts.feed_cache import feed_version
+from posts.follow_graph import follow_graph
+from posts.follows import follow_many, unfollow_many
+from posts.models import Group, Post, Comment, Follow, TimelineEntry, User
+from posts.paginators import ELLIPSIS, page_window
+from posts.thumbnail_store import CARD_WIDTHS, card_variants, variant_formats
+from posts.thumbnails import generate_card_variants
+from posts.views import COMMENTS_Q
 
 
 User = get_user_model()
@@ -39,6 +62,8 @@ class TaskPagesTests(TestCase):
             content=small_gif,
             content_type='image/gif'
         )
+        digest = hashlib.sha256(small_gif).hexdigest()
+        cls.image_name = f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif'
         cls.user = User.objects.create_user(username='auth1')
         cls.group = Group.objects.create(
             title='Тестовая группа',
@@ -88,7 +113,7 @@ class TaskPagesTests(TestCase):
         post = response.context['post']
         post_image_0 = Post.objects.first().image
         self.assertEqual(post.pk, postid)
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, self.image_name)
 
     def test_create_post_edit_correct_context(self):
         """create_post(edit) с правильным контекстом."""
@@ -134,7 +159,7 @@ class TaskPagesTests(TestCase):
                 self.assertEqual(task_author_0, self.user.username)
                 self.assertEqual(task_group_0, self.group.title)
                 self.assertEqual(task_text_0, self.post.text)
-                self.assertEqual(post_image_0, 'posts/small.gif')
+                self.assertEqual(post_image_0, self.image_name)
 
     def test_post_another_group(self):
         """Пост не попал в группу, для которой не был предназначен."""
@@ -182,6 +207,8 @@ class PaginatorViewsTest(TestCase):
             for i in range(POST_N)
         ]
         Post.objects.bulk_create(cls.posts_list)
+        # bulk_create не шлет сигналы, счетчики постов пересчитываем.
+        call_command('rebuild_post_counters', stdout=StringIO())
 
     def setUp(self):
         self.authorized_client = Client()
@@ -220,6 +247,73 @@ class PaginatorViewsTest(TestCase):
                 response.context.get('page_obj').object_list),
                 POST_2)
 
+    def test_cursor_navigation(self):
+        """Лента листается по курсору вперед, назад и в конец."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        first_page = self.client.get(url).context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        second_page = self.client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page.object_list), POST_2)
+        self.assertIsNone(second_page.next_cursor)
+        back_page = self.client.get(
+            url, {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            list(back_page.object_list), list(first_page.object_list)
+        )
+        last_page = self.client.get(
+            url, {'cursor': first_page.paginator.last_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            list(last_page.object_list), list(second_page.object_list)
+        )
+        self.assertEqual(last_page.number, 2)
+        self.assertIsNone(last_page.next_cursor)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Битый курсор отдает первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        self.assertEqual(
+            len(response.context['page_obj'].object_list), POST_1
+        )
+
+    def test_page_number_has_cursor_links(self):
+        """Номерная страница ведет дальше по курсору."""
+        response = self.client.get(reverse('posts:index'), {'page': 2})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertIsNotNone(page_obj.previous_cursor)
+        self.assertIsNone(page_obj.next_cursor)
+
+    def test_page_window(self):
+        """Номера страниц: края и окно вокруг текущей."""
+        self.assertEqual(page_window(1, 3), [1, 2, 3])
+        self.assertEqual(page_window(1, 5000), [1, 2, 3, ELLIPSIS, 5000])
+        self.assertEqual(
+            page_window(50, 5000),
+            [1, ELLIPSIS, 48, 49, 50, 51, 52, ELLIPSIS, 5000],
+        )
+        self.assertEqual(page_window(4, 10), [1, 2, 3, 4, 5, 6, ELLIPSIS, 10])
+
+    def test_long_feed_renders_window(self):
+        """У длинной ленты выводится окно номеров, а не все страницы."""
+        Group.objects.filter(pk=self.group.pk).update(posts_count=50000)
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            {'page': 2},
+        )
+        self.assertEqual(
+            [link.label for link in response.context['page_obj'].links],
+            ['Первая', 'Предыдущая', '1', '2', '3', '4', ELLIPSIS, '5000',
+             'Следующая', 'Последняя'],
+        )
+        self.assertContains(response, 'href="?page=5000"', count=2)
+        self.assertNotContains(response, 'href="?page=4999"')
+
 
 class CommentTests(TestCase):
     @classmethod
@@ -252,6 +346,27 @@ class CommentTests(TestCase):
             form_obj = response.context.get('comments')[0]
             self.assertEqual(form_obj.text, self.comment.text)
 
+    def test_comments_are_paginated(self):
+        """Комментарии идут страницами, следующая — фрагментом."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'коммент {i}')
+            for i in range(COMMENTS_Q)
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_Q)
+        self.assertEqual(comments[0], self.comment)
+        fragment = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': comments.next_cursor},
+        )
+        self.assertTemplateUsed(fragment, 'includes/comments.html')
+        self.assertTemplateNotUsed(fragment, 'base.html')
+        self.assertEqual(len(fragment.context['comments']), 1)
+        self.assertIsNone(fragment.context['comments'].next_cursor)
+
     def test_authorized_can_comment(self):
         """Авторизованный пользователь может комментировать посты."""
         form_data = {
@@ -316,6 +431,7 @@ class CommentTests(TestCase):
 
 class CacheTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='auth4')
         self.authorized_client = Client()
@@ -329,7 +445,7 @@ class CacheTest(TestCase):
         )
         response = self.guest_client.get(reverse('posts:index'))
         content_1 = response.content
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Мимо сигналов')
         response = self.guest_client.get(reverse('posts:index'))
         content_2 = response.content
         self.assertEqual(content_1, content_2)
@@ -338,6 +454,295 @@ class CacheTest(TestCase):
         content_3 = response.content
         self.assertNotEqual(content_1, content_3)
 
+    def test_new_and_deleted_posts_invalidate_index(self):
+        """Новый и удаленный пост сразу видны на главной."""
+        post = Post.objects.create(author=self.user, text='Первый')
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.create(author=self.user, text='Второй')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Второй')
+        post.delete()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Первый')
+
+    def test_edit_invalidates_only_its_page(self):
+        """Правка поста сбрасывает только страницу, где он выводится."""
+        posts = [
+            Post.objects.create(author=self.user, text=f'Пост {i}')
+            for i in range(POST_1 + 1)
+        ]
+        first_url = reverse('posts:index')
+        second_url = first_url + '?page=2'
+        first_content = self.guest_client.get(first_url).content
+        self.guest_client.get(second_url)
+        Post.objects.filter(pk=posts[-1].pk).update(text='Мимо сигналов')
+        posts[0].text = 'Исправленный пост'
+        posts[0].save()
+        self.assertContains(
+            self.guest_client.get(second_url), 'Исправленный пост'
+        )
+        self.assertEqual(
+            self.guest_client.get(first_url).content, first_content
+        )
+
+    def test_edit_reaches_every_cached_copy(self):
+        """Правка сбрасывает страницу у всех зрителей, сколько бы
+        вариантов страницы ни было в кеше."""
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        for i in range(30):
+            client = Client()
+            client.force_login(
+                User.objects.create_user(username=f'viewer_{i}')
+            )
+            client.get(url)
+            self.guest_client.get(url, {'utm': i})
+        post.text = 'Новый текст'
+        post.save()
+        self.assertContains(self.guest_client.get(url), 'Новый текст')
+        self.assertContains(
+            self.guest_client.get(url, {'utm': 0}), 'Новый текст'
+        )
+
+    def test_group_pages_invalidated_per_group(self):
+        """Новый пост сбрасывает кеш только своей группы."""
+        group = Group.objects.create(title='Первая', slug='first')
+        other_group = Group.objects.create(title='Вторая', slug='second')
+        Post.objects.create(author=self.user, text='Старый', group=group)
+        other = Post.objects.create(
+            author=self.user, text='Чужой', group=other_group
+        )
+        group_url = reverse('posts:group_list', args=(group.slug,))
+        other_url = reverse('posts:group_list', args=(other_group.slug,))
+        self.guest_client.get(group_url)
+        other_content = self.guest_client.get(other_url).content
+        Post.objects.filter(pk=other.pk).update(text='Мимо сигналов')
+        Post.objects.create(author=self.user, text='Свежий', group=group)
+        self.assertContains(self.guest_client.get(group_url), 'Свежий')
+        self.assertEqual(
+            self.guest_client.get(other_url).content, other_content
+        )
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.user = User.objects.create_user(username='etag_author')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.group = Group.objects.create(
+            title='Группа', slug='etag_slug', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизмененная страница — 304 одним запросом к базе."""
+        urls = (
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with self.assertNumQueries(1):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_post_changes_etag(self):
+        """Комментарий и правка поста меняют ETag его страницы."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Да')
+        etag = response['ETag']
+        self.post.text = 'Исправлено'
+        self.post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Исправлено')
+
+    def test_feed_changes_etag(self):
+        """Правка поста меняет ETag ленты группы."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        etag = self.guest_client.get(url)['ETag']
+        self.post.text = 'Исправлено'
+        self.post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Исправлено')
+
+    def test_viewer_changes_etag(self):
+        """Гость и автор получают разные ETag одной страницы."""
+        url = reverse('posts:profile', args=(self.user.username,))
+        etag = self.guest_client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.revalidate(self.authorized_client, url).status_code, 304
+        )
+
+
+class BenchTemplatesTest(TestCase):
+    def test_bench_templates(self):
+        """Замер рендерит каждый шаблон posts и ничего не оставляет."""
+        out = StringIO()
+        call_command(
+            'bench_templates', '--posts', '3', '--repeat', '2', stdout=out
+        )
+        for name in ('index', 'group_list', 'profile', 'follow', 'search',
+                     'post_detail', 'create_post'):
+            self.assertIn(f'posts/{name}.html: ', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='card_author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='card_slug', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, text='Карточка', group=self.group
+        )
+
+    def card(self):
+        return render_cards(
+            Post.objects.select_related('author', 'group').filter(
+                pk=self.post.pk
+            )
+        )[0]
+
+    def test_card_is_cached(self):
+        """Карточка берется из кеша, пока пост не изменился."""
+        self.card()
+        Post.objects.filter(pk=self.post.pk).update(text='Мимо сигналов')
+        self.assertIn('Карточка', self.card())
+
+    def test_card_invalidation(self):
+        """Правка поста, группы и имени автора обновляет карточку."""
+        self.card()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertIn('Новый текст', self.card())
+        self.group.slug = 'new_card_slug'
+        self.group.save()
+        self.assertIn('/group/new_card_slug/', self.card())
+        self.user.first_name = 'Николай'
+        self.user.save()
+        self.assertIn('Николай Толстой', self.card())
+
+
+class FeedCommitTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='commit_author')
+        self.group = Group.objects.create(
+            title='Группа', slug='commit_slug', description='Описание'
+        )
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+
+    def versions(self):
+        return [
+            feed_version(feed) for feed in (
+                'index', 'group:commit_slug', 'profile:commit_author'
+            )
+        ]
+
+    def test_rolled_back_rename_keeps_feeds(self):
+        """Откаченное переименование не сбрасывает ленты и карточки."""
+        before = self.versions()
+        updated = Post.objects.get().updated
+        with transaction.atomic():
+            self.group.title = 'Новое имя'
+            self.group.save()
+            self.user.username = 'renamed_author'
+            self.user.save()
+            self.assertEqual(self.versions(), before)
+            transaction.set_rollback(True)
+        self.assertEqual(self.versions(), before)
+        self.assertEqual(Post.objects.get().updated, updated)
+
+    def test_committed_rename_resets_feeds(self):
+        """После коммита переименования ленты получают новые версии."""
+        index, group, profile = self.versions()
+        self.group.title = 'Новое имя'
+        self.group.save()
+        self.user.first_name = 'Лев'
+        self.user.save()
+        new_index, new_group, new_profile = self.versions()
+        self.assertNotEqual(new_index, index)
+        self.assertNotEqual(new_group, group)
+        self.assertNotEqual(new_profile, profile)
+
+
+class FollowCommitTest(TransactionTestCase):
+    """Граф подписок меняется после коммита — транзакции настоящие."""
+
+    def setUp(self):
+        cache.clear()
+        follow_graph.reset()
+        self.author = User.objects.create_user(username='Author')
+        self.follower = User.objects.create_user(username='Follower')
+        for i in range(2):
+            Post.objects.create(text=f'Тестовый текст{i}', author=self.author)
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def test_profile_follow_button_stays_correct(self):
+        """Кнопка подписки в закешированном профиле меняется."""
+        author = User.objects.create_user(username='cached_author')
+        url = reverse('posts:profile', args=(author.username,))
+        self.assertContains(self.follower_client.get(url), 'Подписаться')
+        self.follower_client.get(
+            reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assertContains(self.follower_client.get(url), 'Отписаться')
+        self.assertContains(self.client.get(url), 'Подписаться')
+
+    def test_bulk_follow_and_unfollow(self):
+        """Подписка и отписка списком, лишние имена пропускаются."""
+        other = User.objects.create_user(username='Other')
+        Post.objects.create(text='Пост другого', author=other)
+        url = reverse('posts:follow_bulk')
+        profile_url = reverse('posts:profile', args=(other.username,))
+        self.follower_client.get(profile_url)
+        response = self.follower_client.post(url, {
+            'usernames': 'Author, Other\nFollower nobody Author',
+        })
+        self.assertEqual(response.json(), {'action': 'follow', 'count': 2})
+        self.assertEqual(
+            set(self.follower.follower.values_list('author', flat=True)),
+            {self.author.pk, other.pk},
+        )
+        self.assertEqual(self.follower.timeline.count(), 3)
+        response = self.follower_client.get(profile_url)
+        self.assertTrue(response.context['following'])
+        response = self.follower_client.post(url, {
+            'action': 'unfollow', 'usernames': 'Other',
+        })
+        self.assertEqual(response.json(), {'action': 'unfollow', 'count': 1})
+        self.assertEqual(self.follower.timeline.count(), 2)
+        response = self.follower_client.get(profile_url)
+        self.assertFalse(response.context['following'])
+
 
 class FollowTests(TestCase):
     @classmethod
@@ -356,6 +761,10 @@ class FollowTests(TestCase):
         )
 
     def setUp(self):
+        # Граф подписок сверяет версию в кеше: откат транзакции теста
+        # сигналов не шлет, без сброса он помнил бы прошлые подписки.
+        cache.clear()
+        follow_graph.reset()
         self.authorized_client = Client()
         self.follower_client = Client()
         self.not_follower_client = Client()
@@ -408,3 +817,350 @@ class FollowTests(TestCase):
         self.assertEqual(response_2.context['page_obj']
                          .paginator.page(1)
                          .object_list.count(), 0)
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты всех подписчиков пачками."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.not_follower, author=self.author)
+        with mock.patch('posts.timeline.FANOUT_BATCH', 1):
+            post = Post.objects.create(text='Новый пост', author=self.author)
+        for user in (self.follower, self.not_follower):
+            with self.subTest(user=user):
+                self.assertTrue(
+                    TimelineEntry.objects.filter(user=user, post=post).exists()
+                )
+
+    def test_profile_shows_follow_counts(self):
+        """Профиль показывает подписку и счетчики из графа подписок."""
+        self.follower_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        response = self.follower_client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['followers_count'], 1)
+        self.assertEqual(response.context['following_count'], 0)
+
+    def test_bulk_follow_counts_inserted_only(self):
+        """Подписку, уже вставленную другим процессом, в счет не берем."""
+        User.objects.create_user(username='Other')
+        self.assertFalse(
+            follow_graph.is_following(self.follower.pk, self.author.pk)
+        )
+        # Другой процесс: сигналы сюда не доходят, граф устарел.
+        Follow.objects.bulk_create(
+            [Follow(user=self.follower, author=self.author)]
+        )
+        count = follow_many(self.follower, ['Author', 'Other'])
+        self.assertEqual(count, 1)
+        self.assertEqual(self.follower.follower.count(), 2)
+
+    def test_bulk_unfollow_refreshes_both_profiles(self):
+        """Отписка списком сбрасывает страницы автора и подписчика."""
+        follow_many(self.follower, ['Author'])
+        feeds = ('profile:Author', 'profile:Follower')
+        before = [feed_version(feed) for feed in feeds]
+        self.assertEqual(unfollow_many(self.follower, ['Author']), 1)
+        for feed, version in zip(feeds, before):
+            with self.subTest(feed=feed):
+                self.assertNotEqual(feed_version(feed), version)
+        self.assertFalse(
+            follow_graph.is_following(self.follower.pk, self.author.pk)
+        )
+
+    def test_bulk_follow_from_file(self):
+        """Список авторов принимается файлом JSONL или CSV."""
+        for name, content in (
+            ('follows.jsonl', b'{"username": "Author"}\n'),
+            ('follows.csv', b'username,source\nAuthor,import\n'),
+        ):
+            with self.subTest(name=name):
+                Follow.objects.filter(user=self.follower).delete()
+                response = self.follower_client.post(
+                    reverse('posts:follow_bulk'),
+                    {'file': SimpleUploadedFile(name, content)},
+                )
+                self.assertEqual(response.json()['count'], 1)
+
+    def test_bulk_follow_requires_names(self):
+        """Без имен и файла — ошибка 400."""
+        response = self.follower_client.post(reverse('posts:follow_bulk'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_import_follows_command(self):
+        """Команда подписывает по списку из файла."""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as csv_file:
+            csv_file.write('Author\nnobody\n')
+            csv_file.flush()
+            out = StringIO()
+            call_command(
+                'import_follows', 'Not_Follower', csv_file.name, stdout=out
+            )
+        self.assertIn('Новых подписок: 1', out.getvalue())
+        self.assertTrue(
+            Follow.objects.filter(
+                user=self.not_follower, author=self.author
+            ).exists()
+        )
+
+    def test_unfollow_trims_timeline(self):
+        """После отписки посты автора уходят из ленты."""
+        self.follower_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 2
+        )
+        self.follower_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists()
+        )
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='searcher')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='search_slug', description='Описание'
+        )
+        cls.best = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Кошки, кошки и еще раз кошки',
+        )
+        cls.plain = Post.objects.create(
+            author=cls.other, text='Про кошки и собак, и много чего еще',
+        )
+        Post.objects.create(author=cls.other, text='Только собаки')
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return response, list(response.context['posts'])
+
+    def test_search_ranks_matches(self):
+        """Находятся только совпадения, более релевантные — первыми."""
+        response, posts = self.search(q='кошки')
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(posts, [self.best, self.plain])
+
+    def test_search_by_prefix(self):
+        """Последнее слово ищется по префиксу."""
+        _, posts = self.search(q='соба')
+        self.assertEqual(len(posts), 2)
+
+    def test_search_filters(self):
+        """Поиск сужается группой и автором."""
+        for params, expected in (
+            ({'group': self.group.slug}, [self.best]),
+            ({'author': self.other.username}, [self.plain]),
+        ):
+            with self.subTest(params=params):
+                _, posts = self.search(q='кошки', **params)
+                self.assertEqual(posts, expected)
+
+    def test_search_pages_by_cursor(self):
+        """Следующая страница продолжает выдачу без повторов."""
+        with mock.patch('posts.views.POSTS_Q', 1):
+            response, first = self.search(q='кошки')
+            _, second = self.search(
+                q='кошки', cursor=response.context['next_cursor']
+            )
+        self.assertEqual(first + second, [self.best, self.plain])
+
+    def test_index_follows_edits(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.create(author=self.author, text='Жираф')
+        post.text = 'Бегемот'
+        post.save()
+        self.assertEqual(self.search(q='жираф')[1], [])
+        self.assertEqual(self.search(q='бегемот')[1], [post])
+        post.delete()
+        self.assertEqual(self.search(q='бегемот')[1], [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.plain, Post.objects.get(text='Только собаки')},
+        )
+
+
+@override_settings(MEDIA_ROOT=settings.MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.forget()
+        self.client = Client()
+
+    def create_post(self):
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('thumb.gif', small_gif, 'image/gif'),
+        )
+
+    def test_page_does_not_wait_for_thumbnail(self):
+        """Пока миниатюра в очереди, карточка показывает оригинал,
+        а готовая миниатюра сбрасывает закешированную страницу."""
+        with mock.patch('posts.signals.run_in_background'), \
+                mock.patch('posts.thumbnails.run_in_background') as queue:
+            post = self.create_post()
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, f'src="{post.image.url}"')
+        self.assertNotContains(response, 'srcset=')
+        self.assertEqual(queue.call_count, len(list(card_variants())))
+        generate_card_variants(post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, f'src="{post.image.url}"')
+        self.assertContains(response, '/media/cache/')
+
+    def test_page_thumbnails_in_one_round_trip(self):
+        """Записи миниатюр страницы читаются разом, а не по одной."""
+        for _ in range(3):
+            self.create_post()
+        cache.clear()
+        default.kvstore.forget()
+        with mock.patch.object(
+            KVStore, '_get_raw', side_effect=KVStore._get_raw,
+            autospec=True,
+        ) as single_get, mock.patch.object(
+            LocMemCache, 'get_many', side_effect=LocMemCache.get_many,
+            autospec=True,
+        ) as get_many, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, '<img class="card-img my-2" src="/media/cache/', count=3
+        )
+        single_get.assert_not_called()
+        thumbnail_gets = [
+            call for call in get_many.call_args_list
+            if sorl_settings.THUMBNAIL_KEY_PREFIX in str(call)
+        ]
+        self.assertEqual(len(thumbnail_gets), 1)
+        self.assertEqual(
+            len([q for q in queries if 'thumbnail_kvstore' in q['sql']]), 1
+        )
+
+    def test_card_has_responsive_variants(self):
+        """Карточка перечисляет ширины в srcset, современные форматы —
+        в <source>, если Pillow умеет их писать."""
+        self.create_post()
+        response = self.client.get(reverse('posts:index'))
+        for width in CARD_WIDTHS:
+            self.assertContains(response, f' {width}w')
+        for fmt in variant_formats()[:-1]:
+            self.assertContains(response, f'type="image/{fmt.lower()}"')
+
+    def test_backfill_variants(self):
+        """Команда дорисовывает варианты для старых картинок."""
+        with mock.patch('posts.signals.run_in_background'):
+            post = self.create_post()
+        out = StringIO()
+        call_command('backfill_image_variants', stdout=out)
+        self.assertIn('Обработано картинок: 1', out.getvalue())
+        with mock.patch('posts.thumbnails.run_in_background') as queue:
+            self.client.get(reverse('posts:post_detail', args=(post.pk,)))
+        queue.assert_not_called()
+
+    def test_thumbnail_rendered_on_save(self):
+        """После сохранения поста миниатюра уже готова."""
+        self.create_post()
+        with mock.patch('posts.thumbnails.run_in_background') as queue:
+            response = self.client.get(reverse('posts:index'))
+        queue.assert_not_called()
+        self.assertContains(response, '/media/cache/')
+
+
+@override_settings(BACKGROUND_WORKERS=1)
+class BackgroundThumbnailTests(TransactionTestCase):
+    """Миниатюры с пулом потоков, как в продакшене: запрос не ждет
+    их генерации."""
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.forget()
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        patcher = mock.patch.object(tasks, '_executor', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.shutdown)
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+        # Единственный поток пула занят, пока тест не откроет gate.
+        tasks._get_executor().submit(self.gate.wait, 10)
+        self.user = User.objects.create_user(username='background')
+        self.client.force_login(self.user)
+
+    def shutdown(self):
+        if tasks._executor is not None:
+            tasks._executor.shutdown(wait=True)
+
+    def drain(self):
+        tasks._get_executor().submit(lambda: None).result(timeout=10)
+
+    def test_upload_returns_before_thumbnails(self):
+        """Пост с картинкой сохраняется и показывается до миниатюр."""
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        generate = mock.Mock(wraps=generate_card_variants)
+        with mock.patch('posts.signals.generate_card_variants', generate):
+            response = self.client.post(reverse('posts:post_create'), {
+                'text': 'Фон',
+                'image': SimpleUploadedFile(
+                    'background.gif', small_gif, 'image/gif'
+                ),
+            })
+            self.assertEqual(response.status_code, 302)
+            generate.assert_not_called()
+            post = Post.objects.get(text='Фон')
+            response = self.client.get(reverse('posts:index'))
+            self.assertContains(response, f'src="{post.image.url}"')
+            self.gate.set()
+            self.drain()
+        generate.assert_called_once_with(post.image.name)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), '/media/cache/'
+        )
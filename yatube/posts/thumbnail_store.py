@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings, settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore, KVStoreModel,
+)
+
+# Миниатюра карточки поста: кадр 960x339 и его уменьшенные копии.
+CARD_GEOMETRY: str = '960x339'
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+CARD_WIDTHS = (480, 960)
+# Форматы вариантов по убыванию предпочтения; JPEG — запасной.
+MODERN_FORMATS = ('WEBP',)
+FALLBACK_FORMAT: str = 'JPEG'
+# Записей в LRU процесса и сколько секунд им верить.
+LRU_SIZE: int = 10000
+LRU_TIMEOUT: int = 5 * 60
+
+
+def thumbnail_file(backend, source, geometry_string, options):
+    """Файл миниатюры, как его назовет ThumbnailBackend.get_thumbnail.
+
+    Дополняет `options` настройками по умолчанию так же, как sorl.
+    """
+    if settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry_string, options)
+    return ImageFile(name, default.storage)
+
+
+def card_geometry(width):
+    return f'{width}x{round(width * 339 / 960)}'
+
+
+def variant_formats():
+    """Современные форматы, которые умеет писать Pillow, и JPEG."""
+    Image.init()
+    return [fmt for fmt in MODERN_FORMATS if fmt in Image.SAVE] + [
+        FALLBACK_FORMAT
+    ]
+
+
+def card_variants():
+    """(формат, ширина, геометрия, опции sorl) всех вариантов карточки."""
+    for fmt in variant_formats():
+        for width in CARD_WIDTHS:
+            yield fmt, width, card_geometry(width), dict(
+                CARD_OPTIONS, format=fmt
+            )
+
+
+class LRUKVStore(KVStore):
+    """Хранилище ключей sorl: LRU в памяти процесса перед общим кешем.
+
+    Найденные записи живут в LRU до LRU_TIMEOUT секунд, промахи не
+    запоминаются — миниатюра может появиться в любой момент. Перед
+    рендером страницы `prefetch()` достает записи всех ее картинок
+    одним `get_many` из кеша (и одним запросом к базе для остальных).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+
+    def forget(self):
+        """Очищает LRU процесса; общий кеш и база не меняются."""
+        with self._lock:
+            self._lru.clear()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._lru[key] = (time.monotonic() + LRU_TIMEOUT, value)
+            self._lru.move_to_end(key)
+            while len(self._lru) > LRU_SIZE:
+                self._lru.popitem(last=False)
+
+    def _recall(self, key):
+        with self._lock:
+            expires, value = self._lru.get(key, (0, None))
+            if expires < time.monotonic():
+                self._lru.pop(key, None)
+                return None
+            self._lru.move_to_end(key)
+            return value
+
+    def _get_raw(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        with self._lock:
+            for key in keys:
+                self._lru.pop(key, None)
+
+    def prefetch(self, image_files):
+        """Загружает записи картинок в LRU разом."""
+        keys = {add_prefix(image_file.key) for image_file in image_files}
+        missing = [key for key in keys if self._recall(key) is None]
+        if not missing:
+            return
+        found = self.cache.get_many(missing)
+        absent = [key for key in missing if key not in found]
+        if absent:
+            rows = dict(
+                KVStoreModel.objects.filter(key__in=absent)
+                .values_list('key', 'value')
+            )
+            found.update(rows)
+            self.cache.set_many(
+                {key: rows.get(key, EMPTY_VALUE) for key in absent},
+                settings.THUMBNAIL_CACHE_TIMEOUT,
+            )
+        for key, value in found.items():
+            if value != EMPTY_VALUE:
+                self._remember(key, value)
+
+
+def prefetch_card_thumbnails(posts):
+    """Записи всех вариантов карточек постов страницы — одним заходом."""
+    prefetch = getattr(default.kvstore, 'prefetch', None)
+    if prefetch is None:
+        return
+    sources = [ImageFile(post.image) for post in posts if post.image]
+    prefetch([
+        thumbnail_file(default.backend, source, geometry, options)
+        for source in sources
+        for _, _, geometry, options in card_variants()
+    ])
@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.images import ImageFile
+
+from core.tasks import run_in_background
+
+from .cards import card_key
+from .feed_cache import invalidate_post_pages
+from .models import Post
+from .thumbnail_store import FALLBACK_FORMAT, card_variants, thumbnail_file
+
+# Сколько секунд не ставить повторно ту же миниатюру в очередь.
+PENDING_TIMEOUT: int = 60
+
+
+def _drop_cards(name):
+    """Сбрасывает закешированные карточки постов с картинкой `name`:
+    в них вместо готовой миниатюры стоял оригинал."""
+    posts = Post.objects.filter(image=name).only('pk', 'updated')
+    cache.delete_many([card_key(post) for post in posts])
+    invalidate_post_pages(*(post.pk for post in posts))
+
+
+def post_image(name):
+    """Картинка поста по имени — с хранилищем поля, как в шаблонах:
+    от хранилища зависят ключи sorl и имена миниатюр."""
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def generate_thumbnail(name, geometry_string, options):
+    ThumbnailBackend().get_thumbnail(
+        post_image(name), geometry_string, **options
+    )
+    _drop_cards(name)
+
+
+def generate_card_variants(name):
+    """Рисует все варианты карточки (ширины и форматы) для картинки."""
+    backend = ThumbnailBackend()
+    source = post_image(name)
+    for _, _, geometry, options in card_variants():
+        backend.get_thumbnail(source, geometry, **options)
+    _drop_cards(name)
+
+
+def picture_sources(image):
+    """Готовые варианты картинки для <picture>.
+
+    Возвращает словарь: `sources` — [(mime, srcset)] современных
+    форматов, `srcset` — запасной JPEG, `src` — самый широкий JPEG.
+    Пока вариантов нет, в `src` оригинал, а недостающие варианты бэкенд
+    миниатюр ставит в очередь.
+    """
+    ready = {}
+    src = image.url
+    for fmt, width, geometry, options in card_variants():
+        thumbnail = default.backend.get_thumbnail(image, geometry, **options)
+        if thumbnail.name == image.name:
+            continue
+        ready.setdefault(fmt, []).append(f'{thumbnail.url} {width}w')
+        if fmt == FALLBACK_FORMAT:
+            src = thumbnail.url
+    srcset = ', '.join(ready.pop(FALLBACK_FORMAT, []))
+    sources = [
+        (f'image/{fmt.lower()}', ', '.join(urls))
+        for fmt, urls in ready.items()
+    ]
+    return {'sources': sources, 'srcset': srcset, 'src': src}
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Не рисует миниатюры внутри запроса.
+
+    Готовая миниатюра берется из хранилища ключей sorl как обычно.
+    Если ее нет, генерация уходит в core.tasks.run_in_background, а
+    шаблон пока получает оригинал картинки.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        requested = dict(options)
+        thumbnail = thumbnail_file(self, source, geometry_string, options)
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        if cache.add(f'thumbnail-pending:{thumbnail.key}', 1,
+                     PENDING_TIMEOUT):
+            run_in_background(
+                generate_thumbnail, source.name, geometry_string, requested
+            )
+        # Без фоновых потоков миниатюра уже готова.
+        return default.kvstore.get(thumbnail) or source
@@ -0,0 +1,54 @@
+from .models import Follow, Post, TimelineEntry
+
+FANOUT_BATCH: int = 500
+
+
+def fan_out_post(post_id):
+    """Раскладывает пост по лентам подписчиков автора пачками."""
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'pub_date'
+    ).first()
+    if post is None:
+        return
+    followers = (
+        Follow.objects.filter(author=post['author_id'])
+        .order_by('user_id').values_list('user_id', flat=True)
+    )
+    last_id = 0
+    while True:
+        batch = list(followers.filter(user_id__gt=last_id)[:FANOUT_BATCH])
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id, post_id=post_id,
+                    pub_date=post['pub_date'],
+                )
+                for user_id in batch
+            ),
+            ignore_conflicts=True,
+        )
+        last_id = batch[-1]
+
+
+def backfill_timeline(user_id, author_ids):
+    """Добавляет в ленту пользователя все посты новых авторов."""
+    posts = Post.objects.filter(author__in=author_ids).values_list(
+        'pk', 'pub_date'
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.iterator()
+        ),
+        batch_size=FANOUT_BATCH,
+        ignore_conflicts=True,
+    )
+
+
+def trim_timeline(user_id, author_ids):
+    """Убирает из ленты пользователя посты авторов, от которых он отписан."""
+    TimelineEntry.objects.filter(
+        user=user_id, post__author__in=author_ids
+    ).delete()
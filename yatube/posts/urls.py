@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -9,12 +9,17 @@ urlpatterns = [
     path('group/<slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments, name='post_comments'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -25,4 +30,20 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(f'api/{api.VERSION}/posts/', api.posts, name='api_posts'),
+    path(
+        f'api/{api.VERSION}/posts/<int:post_id>/',
+        api.post_detail, name='api_post_detail'),
+    path(
+        f'api/{api.VERSION}/posts/<int:post_id>/comments/',
+        api.post_comments, name='api_post_comments'),
+    path(
+        f'api/{api.VERSION}/groups/<slug>/posts/',
+        api.group_posts, name='api_group_posts'),
+    path(
+        f'api/{api.VERSION}/profiles/<str:username>/posts/',
+        api.profile_posts, name='api_profile_posts'),
+    path(
+        f'api/{api.VERSION}/follow/posts/',
+        api.follow_posts, name='api_follow_posts'),
 ]
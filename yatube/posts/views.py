@@ -1,23 +1,50 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
-from django.core.paginator import Paginator
+from .models import Comment, Post, Group, User, Follow
 from django.contrib.auth.decorators import login_required
-from .forms import PostForm, CommentForm
-from django.views.decorators.cache import cache_page
+from django.db.models import F
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_POST
+
+from core.query_budget import query_budget
+from core.ratelimit import ratelimit
+from users.models import get_profile
+from .conditional import group_etag, post_etag, profile_etag
+from .forms import BulkFollowForm, PostForm, CommentForm, SearchForm
+from .feed_cache import cache_feed
+from .follow_graph import follow_graph
+from .follows import follow_many, unfollow_many
+from .paginators import CursorPaginator, InvalidCursor, page_links
+from .search import search_posts
 
 POSTS_Q: int = 10
+COMMENTS_Q: int = 20
 
 
-def paginations(request, posts):
-    paginator = Paginator(posts, POSTS_Q)
-    page_number = request.GET.get('page')
+def paginations(request, posts, count=None, key=('-pub_date', '-pk')):
+    """Страница ленты: по курсору `?cursor=`, по номеру `?page=N`.
 
-    return paginator.get_page(page_number)
+    Без параметров отдается первая страница по курсору — без COUNT.
+    Если число постов известно (`count`), COUNT не нужен и для номеров.
+    """
+    paginator = CursorPaginator(posts, POSTS_Q, key=key, count=count)
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        page_obj = paginator.get_page(page_number)
+    else:
+        try:
+            page_obj = paginator.cursor_page(request.GET.get('cursor'))
+        except InvalidCursor:
+            page_obj = paginator.cursor_page()
+    page_obj.links = page_links(page_obj, request.path)
+    # Для cache_feed: правка поста сбросит только страницы с ним.
+    request.feed_post_ids = [post.pk for post in page_obj.object_list]
+    return page_obj
 
 
-@cache_page(20, key_prefix="index_page")
+@query_budget(4)
+@cache_feed('index')
 def index(request):
-    posts = Post.objects.select_related('group').all()
+    posts = Post.objects.select_related('author', 'group')
     page_obj = paginations(request, posts)
     context = {
         'page_obj': page_obj,
@@ -25,10 +52,13 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(5)
+@condition(etag_func=group_etag)
+@cache_feed('group:{slug}')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = paginations(request, posts)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = paginations(request, posts, group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -36,30 +66,69 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(6)
+@condition(etag_func=profile_etag)
+@cache_feed('profile:{username}')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = paginations(request, post_list)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    posts_count = get_profile(author).posts_count
+    post_list = author.posts.select_related('author', 'group')
+    page_obj = paginations(request, post_list, posts_count)
+    following = request.user.is_authenticated and follow_graph.is_following(
+        request.user.pk, author.pk
+    )
     context = {
         'author': author,
+        'posts_count': posts_count,
+        'followers_count': follow_graph.followers_count(author.pk),
+        'following_count': follow_graph.following_count(author.pk),
+        'following': following,
         'page_obj': page_obj,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comments_page(request, post_id):
+    """Страница комментариев поста по курсору `?cursor=`, от старых."""
+    comments = Comment.objects.filter(post=post_id).select_related('author')
+    paginator = CursorPaginator(comments, COMMENTS_Q, key=('created', 'pk'))
+    try:
+        return paginator.cursor_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.cursor_page()
+
+
+@query_budget(5)
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), pk=post_id
+    )
+    get_profile(post.author)
     form = CommentForm()
-    comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
-        'comments': comments
+        'comments': comments_page(request, post.pk)
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(1)
+def post_comments(request, post_id):
+    """Следующая страница комментариев — фрагмент без поста и шаблона."""
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
+@query_budget(14)
 @login_required
+@ratelimit('post_create')
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -74,10 +143,11 @@ def post_create(request):
     return render(request, 'posts/create_post.html', {'form': form})
 
 
+@query_budget(20)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if request.user.id != post.author.id:
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post.pk)
 
     form = PostForm(
@@ -96,7 +166,9 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(4)
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -108,12 +180,17 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(4)
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
     title = 'Все посты авторов, на которых подписан'
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginations(request, posts)
+    posts = Post.objects.filter(
+        timeline_entries__user=request.user
+    ).select_related('author', 'group').annotate(
+        feed_date=F('timeline_entries__pub_date')
+    )
+    page_obj = paginations(request, posts, key=('-feed_date', '-pk'))
     context = {
         'title': title,
         'page_obj': page_obj
@@ -121,7 +198,9 @@ def follow_index(request):
     return render(request, template, context)
 
 
+@query_budget(9)
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -129,10 +208,53 @@ def profile_follow(request, username):
     return redirect('posts:profile', username)
 
 
+@query_budget(8)
 @login_required
+@ratelimit('follow', methods=('GET', 'POST'))
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(author=author, user=request.user)
-    if follow.exists():
-        follow.delete()
+    Follow.objects.filter(author=author, user=request.user).delete()
     return redirect('posts:profile', username)
+
+
+@query_budget(10)
+@login_required
+@require_POST
+@ratelimit('follow')
+def follow_bulk(request):
+    """Подписка или отписка сразу от списка авторов; ответ — JSON."""
+    form = BulkFollowForm(request.POST, request.FILES)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    action = form.cleaned_data['action']
+    if action == BulkFollowForm.UNFOLLOW:
+        count = unfollow_many(request.user, form.get_usernames())
+    else:
+        count = follow_many(request.user, form.get_usernames())
+    return JsonResponse({'action': action, 'count': count})
+
+
+@query_budget(4)
+def search(request):
+    form = SearchForm(request.GET or None)
+    posts, next_cursor = [], None
+    if form.is_valid():
+        query = form.cleaned_data
+        params = {
+            'text': query['q'],
+            'group': query['group'],
+            'author': query['author'],
+            'limit': POSTS_Q,
+        }
+        try:
+            posts, next_cursor = search_posts(
+                cursor=request.GET.get('cursor'), **params
+            )
+        except InvalidCursor:
+            posts, next_cursor = search_posts(**params)
+    context = {
+        'form': form,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+
+from core.query_budget import outside_budget
+
+User = get_user_model()
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Всего постов'
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+
+def get_profile(user):
+    """Профиль пользователя; недостающий создается со счетчиком из базы.
+
+    Профиль заводит сигнал post_save, но bulk_create и loaddata его
+    обходят — страница автора из-за этого не должна падать. Разовая
+    починка в бюджет запросов вьюхи не входит.
+    """
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        with outside_budget():
+            profile, _ = Profile.objects.get_or_create(
+                user=user, defaults={'posts_count': user.posts.count()}
+            )
+        user.profile = profile
+        return profile
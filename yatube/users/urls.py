@@ -6,6 +6,7 @@ from django.contrib.auth.views import (
 
 from django.urls import path, reverse_lazy
 
+from core.ratelimit import ratelimit
 from . import views
 
 app_name = 'users'
@@ -19,7 +20,9 @@ urlpatterns = [
     ),
     path(
         'login/',
-        LoginView.as_view(template_name='users/login.html'),
+        ratelimit('login')(
+            LoginView.as_view(template_name='users/login.html')
+        ),
         name='login'
     ),
     path(
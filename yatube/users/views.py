@@ -1,8 +1,12 @@
+from django.utils.decorators import method_decorator
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
+
+from core.ratelimit import ratelimit
 from .forms import CreationForm
 
 
+@method_decorator(ratelimit('signup'), name='dispatch')
 class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
@@ -133,6 +133,11 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# Сюда собирает collectstatic. Хешированные имена, сжатые копии и
+# раздача через core.middleware.StaticFilesMiddleware включены
+# в settings_production.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -149,3 +154,41 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Потоки для фоновых задач (core.tasks); 0 — выполнять сразу.
+BACKGROUND_WORKERS = 0
+
+# Миниатюры рисуются в фоне, до готовности шаблоны получают оригинал.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+# Записи о миниатюрах: LRU процесса перед кешем и базой.
+THUMBNAIL_KVSTORE = 'posts.thumbnail_store.LRUKVStore'
+
+# Загрузки: файлы больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся во временный
+# файл, больше UPLOAD_MAX_SIZE — отбрасываются (core.uploads).
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+# Частота запросов к пишущим вьюхам и входу (core.ratelimit): скользящее
+# окно в кеше на пользователя и на IP. За прокси IP брать из его
+# заголовка, например 'HTTP_X_FORWARDED_FOR', а в RATELIMIT_PROXY_HOPS
+# указать число своих прокси: адрес берется столько записей с конца.
+RATELIMIT_IP_META = 'REMOTE_ADDR'
+RATELIMIT_PROXY_HOPS = 1
+RATE_LIMITS = {
+    'post_create': {'user': '10/m', 'ip': '60/m'},
+    'add_comment': {'user': '20/m', 'ip': '60/m'},
+    'follow': {'user': '60/m', 'ip': '120/m'},
+    'signup': {'ip': '10/h'},
+    'login': {'ip': '30/m'},
+}
+
+# Превышение бюджета запросов вьюхи (core.query_budget): True — ошибка,
+# False — предупреждение в лог. В разработке и тестах регрессия должна
+# падать, в продакшене (settings_production) — только логироваться.
+QUERY_BUDGET_STRICT = True
@@ -0,0 +1,54 @@
+"""Настройки для продакшена: DEBUG выключен, статика собирается
+collectstatic с хешами в именах и сжатыми копиями, шаблоны кешируются
+загрузчиком, фоновые задачи уходят в пул потоков, кеш общий для всех
+процессов (memcached, адрес в MEMCACHED_LOCATION).
+
+    DJANGO_SETTINGS_MODULE=yatube.settings_production
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+
+# Статику из STATIC_ROOT отдает сам Django: сразу после SecurityMiddleware,
+# до сессий и прочего, что статике не нужно.
+MIDDLEWARE = [
+    MIDDLEWARE[0],  # noqa: F405
+    'core.middleware.StaticFilesMiddleware',
+    *MIDDLEWARE[1:],  # noqa: F405
+]
+
+# Версии лент и постов, граф подписок и счетчики частоты запросов
+# сбрасываются через кеш: у каждого процесса свой LocMemCache не увидел
+# бы чужих сбросов.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ.get('MEMCACHED_LOCATION', '127.0.0.1:11211'),
+    }
+}
+
+# Раскладка постов по лентам и миниатюры — после коммита, вне запроса.
+BACKGROUND_WORKERS = 4
+
+# Превышение бюджета запросов — в лог, а не ошибкой на запросе.
+QUERY_BUDGET_STRICT = False
+
+# Шаблоны разбираются один раз на процесс, а не на каждый запрос.
+TEMPLATES = [{
+    **TEMPLATES[0],  # noqa: F405
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],  # noqa: F405
+        'debug': False,
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]